@@ -0,0 +1,298 @@
+import bisect
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import threading
+from collections import deque
+
+LEGACY_ATTENDANCE_FILE = "attendance.json"
+
+
+class AttendanceIndex:
+    # In-memory view shared by the backends: date and name indexes, kept up to date
+    # as records arrive, and the statistics derived from them
+    def __init__(self):
+        self.lock = threading.RLock()
+        # Set once the index has caught up with everything stored at least once
+        self.loaded = threading.Event()
+        self.by_date = {}
+        self.by_name = {}
+        # Dates kept in order as they arrive, so trends never sort the whole history
+        self.sorted_dates = []
+        self.record_count = 0
+        self.version = 0
+        # (version, date, name, time, replaced) for the most recent index changes, so
+        # derived views can catch up without rebuilding from the whole history
+        self.changes = deque(maxlen=100000)
+        self._statistics = None
+        self._statistics_key = None
+
+    def _index(self, date, name, time):
+        if date not in self.by_date:
+            bisect.insort(self.sorted_dates, date)
+        records = self.by_date.setdefault(date, {})
+        previous = records.get(name)
+        if previous is None:
+            self.record_count += 1
+        elif previous <= time:
+            # A later check-in the same day never moves the arrival time
+            return
+        records[name] = time
+        self.by_name.setdefault(name, {})[date] = time
+        self.version += 1
+        self.changes.append((self.version, date, name, time, previous is not None))
+
+    def _reset_index(self):
+        self.by_date = {}
+        self.by_name = {}
+        self.sorted_dates = []
+        self.record_count = 0
+        self.changes.clear()
+        self.version += 1
+
+    def refresh(self):
+        # Catch up in chunks, taking the lock per chunk so writers are never held up
+        # for the whole history
+        while self._refresh_chunk():
+            pass
+        self.loaded.set()
+
+    def load_in_background(self):
+        threading.Thread(target=self.refresh, daemon=True).start()
+
+    def _refresh_chunk(self):
+        return False
+
+    def changes_since(self, version):
+        # Changes after `version`, or None once they have aged out of the log (or the
+        # index was reset) and the caller has to rebuild. Call with the lock held
+        if version == self.version:
+            return []
+        if not self.changes or self.changes[0][0] > version + 1 or version > self.version:
+            return None
+        return list(itertools.islice(self.changes, version + 1 - self.changes[0][0], None))
+
+    def checked_in(self, date, name):
+        with self.lock:
+            self.refresh()
+            return name in self.by_date.get(date, ())
+
+    def summary(self):
+        with self.lock:
+            self.refresh()
+            per_day = {date: len(records) for date, records in self.by_date.items()}
+            per_person = {name: len(days) for name, days in self.by_name.items()}
+            return per_day, per_person
+
+    def statistics(self, today, days=30, top=10):
+        # Headline numbers, the last `days` recorded days and the `top` most present people,
+        # cached until a new record arrives. Each day's and person's count is the size of
+        # its index entry, so nothing here walks the individual records
+        with self.lock:
+            self.refresh()
+            key = (self.version, today, days, top)
+            if key != self._statistics_key:
+                recent = self.sorted_dates[-days:]
+                self._statistics = {
+                    'today': len(self.by_date.get(today, ())),
+                    'total': self.record_count,
+                    'days': len(self.by_date),
+                    'people': len(self.by_name),
+                    'average': self.record_count / len(self.by_date) if self.by_date else 0.0,
+                    'trend': [(date, len(self.by_date[date])) for date in recent],
+                    'top': heapq.nlargest(
+                        top, ((name, len(days)) for name, days in self.by_name.items()),
+                        key=lambda item: item[1]
+                    )
+                }
+                self._statistics_key = key
+            return self._statistics
+
+
+
+class JsonLinesAttendanceStore(AttendanceIndex):
+    # One {"date", "name", "time"} object per line; a check-in is a single appended line.
+    # The index is built on first read (or by load_in_background), not on open
+    def __init__(self, path="attendance.jsonl", chunk_size=1 << 22):
+        super().__init__()
+        self.path = path
+        self.chunk_size = chunk_size
+        self.write_lock = threading.Lock()
+        self._offset = 0
+        self._stat = None
+
+    def _refresh_chunk(self):
+        # Pick up lines appended by other processes; re-read everything only if the file shrank
+        with self.lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                if self._offset:
+                    self._reset_index()
+                self._offset, self._stat = 0, None
+                return False
+            key = (stat.st_mtime_ns, stat.st_size)
+            if key == self._stat:
+                return False
+            if stat.st_size < self._offset:
+                self._reset_index()
+                self._offset = 0
+
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read(self.chunk_size)
+            # A trailing line without a newline is still being written (or was cut off by a crash)
+            end = data.rfind(b"\n") + 1
+            lines = [line for line in data[:end].split(b"\n") if line.strip()]
+            try:
+                # One parse per chunk; fall back to line by line to skip a corrupt line
+                records = json.loads(b"[" + b",".join(lines) + b"]")
+            except ValueError:
+                records = []
+                for line in lines:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+            for record in records:
+                self._index(record['date'], record['name'], record['time'])
+            self._offset += end
+            more = end > 0 and self._offset < stat.st_size
+            if not more:
+                self._stat = key
+            return more
+
+    def is_empty(self):
+        try:
+            return os.path.getsize(self.path) == 0
+        except FileNotFoundError:
+            return True
+
+    def record(self, date, name, time):
+        self.record_many([(date, name, time)])
+
+    def record_many(self, rows):
+        # Only the append is done here; the index picks the lines up on its next refresh
+        lines = "".join(
+            json.dumps({'date': date, 'name': name, 'time': time}) + "\n"
+            for date, name, time in rows
+        ).encode()
+        with self.write_lock:
+            with open(self.path, 'ab+') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell():
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        # Fence off a line cut short by a crash so it cannot swallow ours
+                        lines = b"\n" + lines
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def close(self):
+        pass
+
+
+class SQLiteAttendanceStore(AttendanceIndex):
+    def __init__(self, path="attendance.db", chunk_size=100000):
+        super().__init__()
+        self.path = path
+        self.chunk_size = chunk_size
+        self.last_id = 0
+        # The connection is shared with the background loader, one statement at a time
+        self.conn_lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS attendance (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date TEXT NOT NULL,
+                name TEXT NOT NULL,
+                time TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance (date);
+            CREATE INDEX IF NOT EXISTS idx_attendance_name ON attendance (name);
+        """)
+        self.conn.commit()
+
+    def _refresh_chunk(self):
+        # Rows are never updated, so anything new has an id past the last one seen
+        with self.lock:
+            with self.conn_lock:
+                rows = self.conn.execute(
+                    "SELECT id, date, name, time FROM attendance WHERE id > ? ORDER BY id LIMIT ?",
+                    (self.last_id, self.chunk_size)
+                ).fetchall()
+            for row_id, date, name, time in rows:
+                self._index(date, name, time)
+                self.last_id = row_id
+            return len(rows) == self.chunk_size
+
+    def is_empty(self):
+        with self.conn_lock:
+            return self.conn.execute("SELECT 1 FROM attendance LIMIT 1").fetchone() is None
+
+    def record(self, date, name, time):
+        self.record_many([(date, name, time)])
+
+    def record_many(self, rows):
+        with self.conn_lock:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO attendance (date, name, time) VALUES (?, ?, ?)", rows
+                )
+
+    def close(self):
+        with self.conn_lock:
+            self.conn.close()
+
+
+def migrate_legacy_json(store, legacy_path=LEGACY_ATTENDANCE_FILE):
+    # One-time import of the old whole-file attendance.json layout
+    if not os.path.exists(legacy_path) or not store.is_empty():
+        return 0
+    with open(legacy_path, 'r') as f:
+        legacy = json.load(f)
+    rows = [(date, name, time) for date, records in sorted(legacy.items())
+            for name, time in records.items()]
+    store.record_many(rows)
+    os.replace(legacy_path, legacy_path + ".migrated")
+    return len(rows)
+
+
+def migrate_backend(store, source):
+    # Moves the history out of the other backend's store after the backend setting changed,
+    # then retires its file so the records live in exactly one place
+    if not store.is_empty() or source.is_empty():
+        source.close()
+        return 0
+    with source.lock:
+        source.refresh()
+        rows = [(date, name, time) for date in source.sorted_dates
+                for name, time in source.by_date[date].items()]
+    source.close()
+    store.record_many(rows)
+    os.replace(source.path, source.path + ".migrated")
+    return len(rows)
+
+
+BACKENDS = {
+    'jsonl': (JsonLinesAttendanceStore, "attendance.jsonl"),
+    'sqlite': (SQLiteAttendanceStore, "attendance.db")
+}
+
+
+def open_attendance_store(backend="jsonl", path=None):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown attendance backend: {backend}")
+    store_class, default_path = BACKENDS[backend]
+    store = store_class(path or default_path)
+    if path is None:
+        for other, (other_class, other_path) in BACKENDS.items():
+            if other != backend and os.path.exists(other_path):
+                migrate_backend(store, other_class(other_path))
+    migrate_legacy_json(store)
+    return store
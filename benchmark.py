@@ -0,0 +1,403 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+import numpy as np
+from matcher import BruteForceIndex, IVFIndex
+
+SECTIONS = ('model', 'detection', 'embedding', 'matcher', 'attendance', 'reports')
+
+
+def timed(fn, repeat=5):
+    # Median and best wall time in ms; the first call is not discarded, so warm up first
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples)), min(samples)
+
+
+def synthetic_gallery(n_identities, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    gallery = rng.standard_normal((n_identities, dim)).astype(np.float32)
+    labels = np.array([f"person_{i}" for i in range(n_identities)], dtype=object)
+    return labels, gallery
+
+
+def synthetic_probes(gallery, n_queries, noise=0.3, seed=1):
+    rng = np.random.default_rng(seed)
+    truth = rng.choice(len(gallery), n_queries, replace=False)
+    probes = gallery[truth] + noise * rng.standard_normal((n_queries, gallery.shape[1])).astype(np.float32)
+    return truth, probes
+
+
+def synthetic_history(n_people, n_days, presence=0.9, seed=2, end=date(2024, 12, 31)):
+    # (date, name, time) rows on business days, arrivals spread around 09:00
+    rng = np.random.default_rng(seed)
+    days = []
+    day = end
+    while len(days) < n_days:
+        if day.weekday() < 5:
+            days.append(day.strftime("%Y-%m-%d"))
+        day -= timedelta(days=1)
+    days.reverse()
+    names = [f"person_{i}" for i in range(n_people)]
+    rows = []
+    for day in days:
+        present = rng.random(n_people) < presence
+        seconds = np.clip(rng.normal(9 * 3600, 12 * 60, n_people), 7 * 3600, 12 * 3600).astype(int)
+        for name, here, second in zip(names, present, seconds):
+            if here:
+                rows.append((day, name, f"{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}"))
+    return names, days, rows
+
+
+def enrollment_images(db_path, limit):
+    from gallery import EmbeddingGallery
+    import cv2
+    paths = sorted(EmbeddingGallery(db_path).scan())[:limit]
+    images = [(path, cv2.imread(path)) for path in paths]
+    return [(path, img) for path, img in images if img is not None]
+
+
+def bench_model(model_name, detector_backend):
+    from deepface import DeepFace
+    start = time.perf_counter()
+    DeepFace.build_model(model_name)
+    load_ms = (time.perf_counter() - start) * 1000
+    print(f"model   {model_name:>12}  load {load_ms:9.1f} ms")
+    return [{'benchmark': 'model', 'case': model_name, 'size': 1, 'load_ms': load_ms}]
+
+
+def bench_detection(images, detector_backend):
+    from quality import QualityGate
+    gate = QualityGate(detector_backend)
+    gate.detect(images[0][1])
+    found = 0
+    start = time.perf_counter()
+    for _, img in images:
+        if gate.detect(img) is not None:
+            found += 1
+    per_image = (time.perf_counter() - start) * 1000 / len(images)
+    print(f"detect  {detector_backend:>12}  {per_image:9.1f} ms/image  faces {found}/{len(images)}")
+    return [{
+        'benchmark': 'detection', 'case': detector_backend, 'size': len(images),
+        'per_image_ms': per_image, 'faces_found': found
+    }]
+
+
+def bench_embedding(images, model_name, detector_backend, batch_sizes):
+    from gallery import EmbeddingGallery
+    from quality import QualityGate
+    gate = QualityGate(detector_backend)
+    faces = []
+    for _, img in images:
+        face = gate.detect(img)
+        if face is not None:
+            aligned = face['face']
+            if aligned.dtype != np.uint8:
+                aligned = (aligned * 255).clip(0, 255).astype(np.uint8)
+            faces.append(aligned[:, :, ::-1].copy())
+    if not faces:
+        print("embed   no faces found in the enrollment images, skipped")
+        return []
+
+    gallery = EmbeddingGallery("db", model_name, detector_backend)
+    gallery.represent_face(faces[0])
+    rows = []
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        if batch_size == 1:
+            for face in faces:
+                gallery.represent_face(face)
+        else:
+            for i in range(0, len(faces), batch_size):
+                gallery.represent_faces(faces[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+        rows.append({
+            'benchmark': 'embedding', 'case': f"{model_name} batch {batch_size}", 'size': len(faces),
+            'per_face_ms': elapsed * 1000 / len(faces), 'faces_per_s': len(faces) / elapsed
+        })
+        print(
+            f"embed   batch {batch_size:>6}  {elapsed * 1000 / len(faces):9.1f} ms/face  "
+            f"{len(faces) / elapsed:7.1f} faces/s"
+        )
+    return rows
+
+
+def bench_matcher(sizes, dim, n_queries, k, metric, n_probe):
+    rows = []
+    for size in sizes:
+        labels, gallery = synthetic_gallery(size, dim)
+        truth, probes = synthetic_probes(gallery, min(n_queries, size))
+
+        for name, index in (
+            ("brute", BruteForceIndex(metric)),
+            ("ivf", IVFIndex(metric, n_probe=n_probe))
+        ):
+            start = time.perf_counter()
+            index.build(labels, gallery)
+            build_s = time.perf_counter() - start
+
+            hits = 0
+            start = time.perf_counter()
+            for i, probe in zip(truth, probes):
+                results = index.search(probe, k=k)
+                if results and results[0][0] == labels[i]:
+                    hits += 1
+            query_s = (time.perf_counter() - start) / len(probes)
+
+            rows.append({
+                'benchmark': 'matcher',
+                'case': name,
+                'size': size,
+                'build_ms': build_s * 1000,
+                'query_ms': query_s * 1000,
+                'recall_at_1': hits / len(probes)
+            })
+            print(
+                f"{size:>8} {name:>6}  build {build_s * 1000:9.1f} ms  "
+                f"query {query_s * 1000:8.3f} ms  recall@1 {hits / len(probes):.3f}"
+            )
+    return rows
+
+
+def bench_attendance(writes, workdir):
+    # The same call _record_attendance makes for every check-in, one durable write each.
+    # The store classes are used directly: open_attendance_store would migrate (and
+    # rename) a real attendance.json sitting in the working directory
+    from attendance_store import JsonLinesAttendanceStore, SQLiteAttendanceStore
+    rows = []
+    for backend, store_class in (("jsonl", JsonLinesAttendanceStore), ("sqlite", SQLiteAttendanceStore)):
+        path = os.path.join(workdir, f"bench_attendance.{backend}")
+        store = store_class(path)
+        start = time.perf_counter()
+        for i in range(writes):
+            store.record("2024-12-31", f"person_{i}", "09:00:00")
+        per_write = (time.perf_counter() - start) * 1000 / writes
+
+        _, _, history = synthetic_history(100, 20)
+        start = time.perf_counter()
+        store.record_many(history)
+        bulk = (time.perf_counter() - start) * 1000
+        store.close()
+
+        def reopen():
+            # Opening is lazy; the index is built by the first refresh
+            reopened = store_class(path)
+            reopened.refresh()
+            reopened.close()
+
+        reopen_ms, _ = timed(reopen, repeat=3)
+        rows.append({
+            'benchmark': 'attendance', 'case': backend, 'size': writes,
+            'per_write_ms': per_write, 'bulk_insert_ms': bulk, 'reopen_ms': reopen_ms
+        })
+        print(
+            f"record  {backend:>12}  {per_write:9.3f} ms/write  bulk {len(history)} rows {bulk:8.1f} ms  "
+            f"reopen {reopen_ms:8.1f} ms"
+        )
+    return rows
+
+
+def bench_reports(people, days, workdir, repeat):
+    from attendance_store import JsonLinesAttendanceStore
+    from reports import REPORT_FORMATS, ReportEngine, write_report
+    names, dates, history = synthetic_history(people, days)
+    store = JsonLinesAttendanceStore(os.path.join(workdir, f"bench_reports_{people}x{days}.jsonl"))
+    store.record_many(history)
+    # Index the history up front so the frame timing is the frame build alone
+    store.refresh()
+    engine = ReportEngine(store)
+    start_date, end_date = dates[0], dates[-1]
+    case = f"{people}x{days}"
+
+    start = time.perf_counter()
+    engine.frame()
+    rows = [{
+        'benchmark': 'reports', 'case': f"frame {case}", 'size': len(history),
+        'median_ms': (time.perf_counter() - start) * 1000, 'best_ms': None
+    }]
+    # A check-in after the frame is built: only the new row is appended
+    store.record(end_date, "visitor", "12:00:00")
+    start = time.perf_counter()
+    engine.frame()
+    rows.append({
+        'benchmark': 'reports', 'case': f"append {case}", 'size': 1,
+        'median_ms': (time.perf_counter() - start) * 1000, 'best_ms': None
+    })
+    generators = {
+        'daily': lambda: engine.records(end_date, end_date),
+        'records': lambda: engine.records(start_date, end_date),
+        'late': lambda: engine.late(start_date, end_date, "09:00-17:00", 15),
+        'summary': lambda: engine.summary(start_date, end_date, "09:00-17:00", 15, roster=names),
+        'absences': lambda: engine.absences(start_date, end_date, names)
+    }
+    for name, generate in generators.items():
+        median, best = timed(generate, repeat)
+        rows.append({
+            'benchmark': 'reports', 'case': f"{name} {case}", 'size': len(history),
+            'median_ms': median, 'best_ms': best
+        })
+
+    records = engine.records(start_date, end_date)
+    for fmt in REPORT_FORMATS:
+        path = os.path.join(workdir, f"bench_report.{fmt}")
+        try:
+            median, best = timed(lambda: write_report(records, path, "Benchmark", 'date'), repeat)
+        except ImportError as e:
+            print(f"report  write {fmt} skipped: {e}")
+            continue
+        rows.append({
+            'benchmark': 'reports', 'case': f"write {fmt} {case}", 'size': len(records),
+            'median_ms': median, 'best_ms': best
+        })
+    store.close()
+
+    for row in rows:
+        print(f"report  {row['case']:>24}  {row['median_ms']:9.1f} ms")
+    return rows
+
+
+def build_info():
+    try:
+        commit = subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def write_results(path, rows, info):
+    if path.endswith('.csv'):
+        fields = ['benchmark', 'case', 'size']
+        fields += sorted({key for row in rows for key in row} - set(fields))
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, 'w') as f:
+            json.dump({'build': info, 'results': rows}, f, indent=2)
+
+
+def load_results(path):
+    if path.endswith('.csv'):
+        with open(path, newline='') as f:
+            return [
+                {key: _number(value) for key, value in row.items()}
+                for row in csv.DictReader(f)
+            ]
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def compare(rows, baseline, tolerance):
+    # Flags every *_ms timing more than `tolerance` slower than the same case in the baseline
+    previous = {(row['benchmark'], row['case'], int(row['size'])): row for row in baseline}
+    regressions = 0
+    for row in rows:
+        old = previous.get((row['benchmark'], row['case'], int(row['size'])))
+        if old is None:
+            continue
+        for key, value in row.items():
+            if not key.endswith('_ms') or not value or not old.get(key):
+                continue
+            ratio = value / float(old[key])
+            if ratio > 1 + tolerance:
+                regressions += 1
+                print(
+                    f"REGRESSION {row['benchmark']} {row['case']} ({row['size']}) {key}: "
+                    f"{float(old[key]):.3f} -> {value:.3f} ms ({ratio:.2f}x)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attendance system benchmarks")
+    parser.add_argument('--only', nargs='+', choices=SECTIONS, default=list(SECTIONS),
+                        help="benchmarks to run (default: all)")
+    parser.add_argument('--db', default="db", help="enrollment images for detection and embedding")
+    parser.add_argument('--images', type=int, default=50, help="enrollment images to use")
+    parser.add_argument('--model', default="VGG-Face")
+    parser.add_argument('--detector', default="opencv")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--dim', type=int, default=512)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--metric', default="cosine")
+    parser.add_argument('--n-probe', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=200, help="single check-ins per attendance backend")
+    parser.add_argument('--people', type=int, nargs='+', default=[100, 1000],
+                        help="synthetic staff sizes for the report benchmarks")
+    parser.add_argument('--days', type=int, default=250, help="business days of synthetic history")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="write results to this .json or .csv file")
+    parser.add_argument('--baseline', help="earlier results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="slowdown that counts as a regression (default: 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    rows = []
+    needs_model = {'model', 'detection', 'embedding'} & set(args.only)
+    if needs_model:
+        try:
+            import deepface  # noqa: F401
+            images = enrollment_images(args.db, args.images)
+        except ImportError as e:
+            print(f"Skipping {', '.join(sorted(needs_model))}: {e}", file=sys.stderr)
+            images = None
+        if images == []:
+            print(f"Skipping {', '.join(sorted(needs_model - {'model'}))}: no images in {args.db}",
+                  file=sys.stderr)
+        if images is not None and 'model' in args.only:
+            rows += bench_model(args.model, args.detector)
+        if images and 'detection' in args.only:
+            rows += bench_detection(images, args.detector)
+        if images and 'embedding' in args.only:
+            rows += bench_embedding(images, args.model, args.detector, args.batch_sizes)
+
+    if 'matcher' in args.only:
+        rows += bench_matcher(args.sizes, args.dim, args.queries, args.k, args.metric, args.n_probe)
+    with tempfile.TemporaryDirectory() as workdir:
+        if 'attendance' in args.only:
+            rows += bench_attendance(args.writes, workdir)
+        if 'reports' in args.only:
+            for people in args.people:
+                rows += bench_reports(people, args.days, workdir, args.repeat)
+
+    if args.output:
+        write_results(args.output, rows, build_info())
+        print(f"Results written to {args.output}", file=sys.stderr)
+    if args.baseline:
+        regressions = compare(rows, load_results(args.baseline), args.tolerance)
+        print(f"{regressions} regressions against {args.baseline}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import threading
+import time
+from collections import deque
+import cv2
+import numpy as np
+from PIL import Image
+from metrics import span
+
+ELLIPSE_COLOR = (78, 99, 235)
+TRACK_COLOR = (94, 197, 34)
+
+
+def guide_ellipse(w, h):
+    center_x, center_y = w//2, h//2
+    size = min(w, h) // 2
+    width = int(size * 0.5)  # Experiment with this ratio for best results
+    height = int(size * 0.8)
+    return (center_x, center_y), (width, height)
+
+
+def parse_devices(spec):
+    # "0", "0, 1" or "0, videos/door.mp4, rtsp://..." -> [0, 'videos/door.mp4', 'rtsp://...']
+    devices = []
+    for part in str(spec).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        devices.append(int(part) if part.isdigit() else part)
+    return devices
+
+
+def ellipse_pixels(frame_size, preview_size):
+    # Pixel indices of the guide ellipse on the preview, placed where guide_ellipse
+    # puts it on the full frame so it matches the region verification looks at
+    (fw, fh), (pw, ph) = frame_size, preview_size
+    (cx, cy), (ax, ay) = guide_ellipse(fw, fh)
+    sx, sy = pw / fw, ph / fh
+    mask = np.zeros((ph, pw), dtype=np.uint8)
+    cv2.ellipse(mask, (round(cx * sx), round(cy * sy)), (round(ax * sx), round(ay * sy)),
+                0, 0, 360, 1, 2)
+    return np.nonzero(mask)
+
+
+class FrameBuffer:
+    # Bounded ring of prepared frames; a slow consumer only ever sees the newest one
+    def __init__(self, capacity=2):
+        self._frames = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._lock:
+            if len(self._frames) == self._frames.maxlen:
+                self.dropped += 1
+            self._frames.append(item)
+
+    def latest(self):
+        with self._lock:
+            if not self._frames:
+                return None
+            item = self._frames.pop()
+            self.dropped += len(self._frames)
+            self._frames.clear()
+            return item
+
+
+class RateCounter:
+    def __init__(self, window=1.0):
+        self.window = window
+        self.rate = 0.0
+        self._count = 0
+        self._start = time.perf_counter()
+
+    def tick(self):
+        self._count += 1
+        now = time.perf_counter()
+        elapsed = now - self._start
+        if elapsed >= self.window:
+            self.rate = self._count / elapsed
+            self._count = 0
+            self._start = now
+
+
+class LatencyMeter:
+    # Mean of the most recent samples, in seconds
+    def __init__(self, size=50):
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self._samples.append(seconds)
+
+    @property
+    def mean(self):
+        samples = list(self._samples)
+        return sum(samples) / len(samples) if samples else None
+
+
+class CaptureWorker(threading.Thread):
+    def __init__(self, device=0, preview_size=(640, 480), buffer_size=2, name=None):
+        super().__init__(daemon=True)
+        self.device = device
+        self.label = name or str(device)
+        self.preview_size = preview_size
+        self.buffer = FrameBuffer(buffer_size)
+        self.buffer_size = buffer_size
+        self._preview_key = None
+        self.fps = RateCounter()
+        # Submit-to-result time of the verifications run on this camera's frames
+        self.latency = LatencyMeter()
+        self.read_failures = 0
+        # (box, label) pairs drawn on the preview, set by the hands-free recognizer
+        self.overlay_boxes = []
+        self._raw = None
+        self._raw_index = 0
+        self._raw_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.camera = cv2.VideoCapture(device)
+        # Local video files stand in for cameras when testing: play them at their
+        # own frame rate and loop at the end instead of draining them at full speed
+        self.is_file = isinstance(device, str) and "://" not in device
+        file_fps = self.camera.get(cv2.CAP_PROP_FPS) if self.is_file else 0
+        self.frame_interval = 1.0 / file_fps if file_fps > 0 else 0.0
+
+    def run(self):
+        next_frame = time.perf_counter()
+        try:
+            while not self._stop_event.is_set():
+                if self.frame_interval:
+                    delay = next_frame - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_frame = max(next_frame, time.perf_counter() - 1.0) + self.frame_interval
+                # Includes waiting for the device to deliver the next frame
+                with span("capture"):
+                    ret, frame = self.camera.read()
+                if not ret:
+                    self.read_failures += 1
+                    if self.is_file:
+                        self.camera.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    time.sleep(0.01)
+                    continue
+
+                with self._raw_lock:
+                    self._raw = frame
+                    self._raw_index += 1
+                with span("preview"):
+                    self.buffer.put(self._prepare(frame))
+                self.fps.tick()
+        finally:
+            self.camera.release()
+
+    def _preview_buffers(self, frame):
+        # Preallocated per preview size: a BGR scratch frame, the cached ellipse pixels
+        # and a ring of RGBA arrays each wrapped once in a PIL image sharing its memory.
+        # The ring is longer than the frame buffer, so the slot being written is never
+        # one the display might still be reading
+        h, w = frame.shape[:2]
+        key = ((w, h), tuple(self.preview_size))
+        if key != self._preview_key:
+            pw, ph = key[1]
+            self._small = np.empty((ph, pw, 3), dtype=np.uint8)
+            self._ellipse = ellipse_pixels(*key)
+            self._ring = []
+            for _ in range(self.buffer_size + 2):
+                # RGBA because PIL only shares memory with 4-byte pixels; RGB would be copied
+                rgba = np.empty((ph, pw, 4), dtype=np.uint8)
+                self._ring.append((rgba, Image.frombuffer('RGBA', (pw, ph), rgba, 'raw', 'RGBA', 0, 1)))
+            self._ring_index = 0
+            self._preview_key = key
+        self._ring_index = (self._ring_index + 1) % len(self._ring)
+        return self._ring[self._ring_index]
+
+    def _prepare(self, frame):
+        # Downscale first so colour conversion and overlays only touch preview pixels;
+        # the raw frame stays clean for verification
+        rgba, image = self._preview_buffers(frame)
+        pw, ph = self.preview_size
+        cv2.resize(frame, (pw, ph), dst=self._small)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2RGBA, dst=rgba)
+        rgba[self._ellipse] = ELLIPSE_COLOR[::-1] + (255,)
+
+        sx, sy = pw / frame.shape[1], ph / frame.shape[0]
+        color = TRACK_COLOR[::-1] + (255,)
+        for (x, y, bw, bh), label in self.overlay_boxes:
+            x0, y0 = int(x * sx), int(y * sy)
+            cv2.rectangle(rgba, (x0, y0), (int((x + bw) * sx), int((y + bh) * sy)), color, 2)
+            if label:
+                cv2.putText(rgba, label, (x0, max(0, y0 - 6)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        return image
+
+    def latest_raw(self):
+        with self._raw_lock:
+            return None if self._raw is None else self._raw.copy()
+
+    def read_latest(self):
+        # The frame is never written to after capture, so consumers may share it read-only
+        with self._raw_lock:
+            return self._raw_index, self._raw
+
+    def is_opened(self):
+        return self.camera.isOpened()
+
+    def stop(self):
+        self._stop_event.set()
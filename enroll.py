@@ -0,0 +1,146 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from gallery import GALLERY_DIR, EmbeddingGallery, enroll_image, same_directory
+
+
+def _init_worker(model_name, detector_backend):
+    # Build the model once per process instead of once per image
+    from deepface import DeepFace
+    DeepFace.build_model(model_name)
+
+
+def gallery_source(source, cache_dir):
+    # The app only watches the db/ folder next to its caches; a gallery built from any
+    # other tree would never match what it scans
+    gallery_dir = os.path.join(cache_dir, GALLERY_DIR)
+    if source is None:
+        return gallery_dir
+    if not same_directory(source, gallery_dir):
+        raise ValueError(
+            f"{source} is not the app's gallery directory {gallery_dir}. "
+            f"Move the photos there (one folder per person) and enroll that directory."
+        )
+    return source
+
+
+def enroll(source=None, cache_dir=".", model_name="VGG-Face", detector_backend="opencv",
+           workers=None, checkpoint_every=100, half=False, max_templates=None):
+    source = gallery_source(source, cache_dir)
+    gallery = EmbeddingGallery(source, model_name, detector_backend, cache_dir=cache_dir)
+    # Resuming picks up everything a previous (possibly interrupted) run already saved
+    gallery.load()
+    if half:
+        gallery.storage_dtype = np.float16
+
+    pending, touched, removed, stale_rejected = gallery.plan()
+    gallery.apply([], touched, removed, stale_rejected)
+    total = len(pending)
+    print(
+        f"{total} images to embed, {len(gallery.entries)} already enrolled, "
+        f"{len(removed)} removed",
+        file=sys.stderr
+    )
+
+    accepted = rejected = failed = 0
+    batch = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        initializer=_init_worker,
+        initargs=(model_name, detector_backend)
+    ) as pool:
+        futures = {
+            pool.submit(enroll_image, path, mtime, size, model_name, detector_backend): path
+            for path, mtime, size in pending
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                path, mtime, size, digest, embedding, reason = future.result()
+            except Exception as e:
+                # Not the image's fault: leave it out of the cache so the next run retries it
+                failed += 1
+                print(
+                    f"[{done}/{total}] failed {futures[future]}: {type(e).__name__}: {e}",
+                    file=sys.stderr
+                )
+                continue
+            batch.append((path, mtime, size, digest, embedding))
+            if embedding is None:
+                rejected += 1
+                print(f"[{done}/{total}] rejected {path}: {reason}", file=sys.stderr)
+            else:
+                accepted += 1
+
+            if len(batch) >= checkpoint_every:
+                gallery.apply(batch)
+                gallery.save()
+                batch = []
+                rate = done / (time.perf_counter() - start)
+                print(f"[{done}/{total}] checkpoint saved ({rate:.1f} images/s)", file=sys.stderr)
+
+    gallery.apply(batch)
+    gallery.save()
+    if max_templates:
+        pruned = gallery.prune(max_templates)
+        print(f"Pruned {len(pruned)} surplus templates", file=sys.stderr)
+
+    identities = gallery.identities()
+    print(
+        f"Enrolled {accepted}, rejected {rejected}, failed {failed} in {time.perf_counter() - start:.1f}s. "
+        f"Gallery: {len(gallery.entries)} images, {len(identities)} identities -> {gallery.cache_path}",
+        file=sys.stderr
+    )
+    if identities:
+        counts = sorted(identities.values())
+        print(
+            f"Templates per identity: min {counts[0]}, median {counts[len(counts) // 2]}, "
+            f"max {counts[-1]}",
+            file=sys.stderr
+        )
+    return accepted, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the face gallery from a directory with one folder per person"
+    )
+    parser.add_argument('source', nargs='?', default=None,
+                        help=f"enrollment directory, the {GALLERY_DIR} folder in --cache-dir "
+                             f"(default: {GALLERY_DIR})")
+    parser.add_argument('--cache-dir', default=".",
+                        help="where the gallery file is written (default: current directory)")
+    parser.add_argument('--model', default="VGG-Face")
+    parser.add_argument('--detector', default="opencv")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes (default: all cores)")
+    parser.add_argument('--checkpoint-every', type=int, default=100,
+                        help="save progress after this many images")
+    parser.add_argument('--half', action='store_true',
+                        help="store embeddings as float16 to halve the gallery size")
+    parser.add_argument('--max-templates', type=int, default=None,
+                        help="keep at most this many (most diverse) photos per person")
+    args = parser.parse_args()
+
+    try:
+        source = gallery_source(args.source, args.cache_dir)
+    except ValueError as e:
+        parser.error(str(e))
+
+    enroll(
+        source,
+        cache_dir=args.cache_dir,
+        model_name=args.model,
+        detector_backend=args.detector,
+        workers=args.workers,
+        checkpoint_every=args.checkpoint_every,
+        half=args.half,
+        max_templates=args.max_templates
+    )
+
+
+if __name__ == "__main__":
+    main()
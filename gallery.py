@@ -0,0 +1,434 @@
+import hashlib
+import os
+import sys
+import threading
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+# The app enrolls from db/ next to its gallery caches
+GALLERY_DIR = "db"
+# Version 3 records the enrollment root and stores paths relative to it
+CACHE_VERSION = 3
+TEMPLATE_STRATEGIES = ('mean', 'best')
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _l2_normalize(vectors):
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def select_templates(embeddings, count):
+    # Start from the most central embedding, then repeatedly add the one farthest
+    # from those already chosen, so a capped set still covers lighting and pose
+    if len(embeddings) <= count:
+        return list(range(len(embeddings)))
+    unit = _l2_normalize(embeddings)
+    center = _l2_normalize(unit.mean(axis=0, keepdims=True))[0]
+    chosen = [int(np.argmax(unit @ center))]
+    nearest = 1.0 - unit @ unit[chosen[0]]
+    while len(chosen) < count:
+        nxt = int(np.argmax(nearest))
+        chosen.append(nxt)
+        nearest = np.minimum(nearest, 1.0 - unit @ unit[nxt])
+    return sorted(chosen)
+
+
+def same_directory(a, b):
+    return os.path.normcase(os.path.realpath(a)) == os.path.normcase(os.path.realpath(b))
+
+
+def identity_for(db_path, path):
+    # db/<person>/<photo> belongs to <person>; a loose db/<photo> is named after the file
+    parts = os.path.relpath(path, db_path).split(os.sep)
+    if len(parts) > 1:
+        return parts[0]
+    return os.path.splitext(parts[0])[0]
+
+
+class EnrollmentError(ValueError):
+    pass
+
+
+def embed_enrollment_image(img, model_name, detector_backend):
+    from deepface import DeepFace
+    # Raises ValueError when no face is found
+    faces = DeepFace.represent(
+        img_path=img,
+        model_name=model_name,
+        detector_backend=detector_backend,
+        enforce_detection=True
+    )
+    if len(faces) != 1:
+        raise EnrollmentError(f"{len(faces)} faces found, expected exactly one")
+    return np.asarray(faces[0]['embedding'], dtype=np.float32)
+
+
+def enroll_image(path, mtime, size, model_name, detector_backend):
+    # Returns (path, mtime, size, digest, embedding, reason); embedding is None when rejected.
+    # Only a problem with the image itself rejects it; anything else (a missing model,
+    # a failed download, running out of memory) is raised so the image stays pending
+    digest = file_hash(path)
+    try:
+        embedding = embed_enrollment_image(path, model_name, detector_backend)
+    except ValueError as e:
+        return path, mtime, size, digest, None, str(e)
+    return path, mtime, size, digest, embedding, None
+
+
+class EmbeddingGallery:
+    def __init__(self, db_path, model_name="VGG-Face", detector_backend="opencv", cache_dir=".",
+                 storage_dtype=np.float32):
+        self.db_path = db_path
+        self.storage_dtype = storage_dtype
+        self.model_name = model_name
+        self.detector_backend = detector_backend
+        self.cache_path = os.path.join(cache_dir, f"gallery_{model_name}.npz")
+        self.lock = threading.RLock()
+        # path -> {'name', 'mtime', 'size', 'hash', 'embedding'}
+        self.entries = {}
+        # Images without a usable face (or pruned), so unchanged ones are not retried: path -> (mtime, size)
+        self.rejected = {}
+        # Images the last sync could not embed for some other reason, retried next time: path -> error
+        self.failed = {}
+
+    def load(self):
+        entries, rejected = {}, {}
+        if os.path.exists(self.cache_path):
+            with np.load(self.cache_path, allow_pickle=False) as data:
+                if self._accepts(data):
+                    for rel, name, mtime, size, digest, embedding in zip(
+                        self._relative(data, 'paths'), data['names'], data['mtimes'],
+                        data['sizes'], data['hashes'], data['embeddings']
+                    ):
+                        if rel is None:
+                            continue
+                        entries[os.path.join(self.db_path, rel)] = {
+                            'name': str(name),
+                            'mtime': float(mtime),
+                            'size': int(size),
+                            'hash': str(digest),
+                            'embedding': embedding.astype(np.float32)
+                        }
+                    # Keep whatever precision the cache was written with (see enroll.py --half)
+                    self.storage_dtype = data['embeddings'].dtype
+                    for rel, mtime, size in zip(
+                        self._relative(data, 'rejected_paths'), data['rejected_mtimes'],
+                        data['rejected_sizes']
+                    ):
+                        if rel is not None:
+                            rejected[os.path.join(self.db_path, rel)] = (float(mtime), int(size))
+        with self.lock:
+            self.entries = entries
+            self.rejected = rejected
+
+    def _accepts(self, data):
+        # A cache built from another enrollment tree is not this gallery's, so it is
+        # ignored rather than having every one of its images reported as removed
+        if 'version' not in data.files or str(data['model_name']) != self.model_name:
+            return False
+        version = int(data['version'])
+        if version == CACHE_VERSION:
+            return same_directory(str(data['root']), self.db_path)
+        return version == 2
+
+    def _relative(self, data, key):
+        # Cached paths relative to db_path, or None for one outside it
+        if int(data['version']) == CACHE_VERSION:
+            return [str(path) for path in data[key]]
+        # Version 2 stored the paths as scanned, from whichever root it was built
+        relative = []
+        for path in data[key]:
+            path = os.path.relpath(str(path), self.db_path)
+            outside = path == os.pardir or path.startswith(os.pardir + os.sep)
+            relative.append(None if outside else path)
+        return relative
+
+    def save(self):
+        with self.lock:
+            paths, embeddings = self.matrix()
+            entries = [self.entries[p] for p in paths]
+            rejected = sorted(self.rejected.items())
+
+        # Write to a temp file first so a crash never leaves a truncated cache
+        temp_path = self.cache_path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            np.savez(
+                f,
+                version=np.array(CACHE_VERSION),
+                model_name=np.array(self.model_name),
+                root=np.array(os.path.abspath(self.db_path)),
+                paths=np.array([os.path.relpath(p, self.db_path) for p in paths], dtype=str),
+                names=np.array([e['name'] for e in entries], dtype=str),
+                mtimes=np.array([e['mtime'] for e in entries], dtype=np.float64),
+                sizes=np.array([e['size'] for e in entries], dtype=np.int64),
+                hashes=np.array([e['hash'] for e in entries], dtype=str),
+                embeddings=embeddings.astype(self.storage_dtype),
+                rejected_paths=np.array(
+                    [os.path.relpath(p, self.db_path) for p, _ in rejected], dtype=str
+                ),
+                rejected_mtimes=np.array([s[0] for _, s in rejected], dtype=np.float64),
+                rejected_sizes=np.array([s[1] for _, s in rejected], dtype=np.int64)
+            )
+        os.replace(temp_path, self.cache_path)
+
+    def matrix(self, paths=None):
+        with self.lock:
+            if paths is None:
+                paths = sorted(self.entries)
+            if not paths:
+                return paths, np.empty((0, 0), dtype=np.float32)
+            return paths, np.stack([self.entries[p]['embedding'] for p in paths])
+
+    def names(self):
+        with self.lock:
+            return {entry['name'] for entry in self.entries.values()}
+
+    def identities(self):
+        # name -> number of enrollment templates
+        counts = {}
+        with self.lock:
+            for entry in self.entries.values():
+                counts[entry['name']] = counts.get(entry['name'], 0) + 1
+        return counts
+
+    def _grouped(self, names=None):
+        groups = {}
+        with self.lock:
+            for path in sorted(self.entries):
+                entry = self.entries[path]
+                if names is None or entry['name'] in names:
+                    groups.setdefault(entry['name'], []).append((path, entry['embedding']))
+        return groups
+
+    def templates(self, names=None, strategy="mean", max_templates=None):
+        # Matching templates per identity: one normalised mean vector ("mean"),
+        # or up to max_templates individual embeddings matched best-of-k ("best")
+        if strategy not in TEMPLATE_STRATEGIES:
+            raise ValueError(f"Unknown template strategy: {strategy}")
+        labels, vectors = [], []
+        for name, items in self._grouped(names).items():
+            embeddings = np.stack([embedding for _, embedding in items])
+            if max_templates:
+                embeddings = embeddings[select_templates(embeddings, max_templates)]
+            if strategy == "mean":
+                labels.append(name)
+                vectors.append(_l2_normalize(embeddings).mean(axis=0))
+            else:
+                labels.extend([name] * len(embeddings))
+                vectors.extend(embeddings)
+        if not vectors:
+            return labels, np.empty((0, 0), dtype=np.float32)
+        return labels, np.stack(vectors).astype(np.float32)
+
+    def prune(self, max_templates):
+        # Drop surplus templates for good; pruned images are skipped by sync until they change
+        pruned = []
+        for name, items in self._grouped().items():
+            if len(items) <= max_templates:
+                continue
+            keep = set(select_templates(np.stack([e for _, e in items]), max_templates))
+            pruned.extend(path for i, (path, _) in enumerate(items) if i not in keep)
+        with self.lock:
+            for path in pruned:
+                entry = self.entries.pop(path)
+                self.rejected[path] = (entry['mtime'], entry['size'])
+        if pruned:
+            self.save()
+        return pruned
+
+    def scan(self):
+        # Enrollment images may sit directly in db/ or in one folder per person
+        snapshot = {}
+        for root, dirs, files in os.walk(self.db_path):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for file_name in files:
+                if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, file_name)
+                    stat = os.stat(path)
+                    snapshot[path] = (stat.st_mtime, stat.st_size)
+        return snapshot
+
+    def plan(self, snapshot=None):
+        # Work needed to bring the cache in line with the snapshot:
+        # pending (path, mtime, size) to embed, touched paths, removed paths, stale rejections
+        if snapshot is None:
+            snapshot = self.scan()
+        with self.lock:
+            known = {p: (e['mtime'], e['size'], e['hash']) for p, e in self.entries.items()}
+            rejected = dict(self.rejected)
+
+        pending, touched = [], {}
+        for path, (mtime, size) in sorted(snapshot.items()):
+            if rejected.get(path) == (mtime, size):
+                continue
+            previous = known.get(path)
+            if previous and previous[:2] == (mtime, size):
+                continue
+            if previous and previous[2] == file_hash(path):
+                # Touched but identical content: refresh the stat key, keep the embedding
+                touched[path] = (mtime, size)
+                continue
+            pending.append((path, mtime, size))
+
+        removed = [p for p in known if p not in snapshot]
+        stale_rejected = [
+            p for p, stat in rejected.items() if snapshot.get(p) != stat
+        ]
+        return pending, touched, removed, stale_rejected
+
+    def apply(self, results, touched=None, removed=(), stale_rejected=()):
+        # results: (path, mtime, size, digest, embedding) with embedding None for rejected images
+        changed, dropped = [], list(removed)
+        with self.lock:
+            for path in removed:
+                self.entries.pop(path, None)
+            for path in stale_rejected:
+                self.rejected.pop(path, None)
+            for path, (mtime, size) in (touched or {}).items():
+                if path in self.entries:
+                    self.entries[path]['mtime'] = mtime
+                    self.entries[path]['size'] = size
+            for path, mtime, size, digest, embedding in results:
+                if embedding is None:
+                    self.rejected[path] = (mtime, size)
+                    if self.entries.pop(path, None):
+                        dropped.append(path)
+                    continue
+                self.rejected.pop(path, None)
+                self.entries[path] = {
+                    'name': identity_for(self.db_path, path),
+                    'mtime': mtime,
+                    'size': size,
+                    'hash': digest,
+                    'embedding': embedding
+                }
+                changed.append(path)
+        return changed, dropped
+
+    def sync(self, snapshot=None):
+        # Returns (changed, removed): paths whose embeddings were added or replaced, and dropped paths
+        pending, touched, removed, stale_rejected = self.plan(snapshot)
+        results, failed = [], {}
+        for path, mtime, size in pending:
+            try:
+                *result, reason = enroll_image(path, mtime, size, self.model_name, self.detector_backend)
+            except Exception as e:
+                # Not the image's fault: leave it pending, and log each new error only once
+                failed[path] = f"{type(e).__name__}: {e}"
+                if self.failed.get(path) != failed[path]:
+                    print(f"Could not embed {path}, will retry: {failed[path]}", file=sys.stderr)
+                continue
+            if reason is not None:
+                print(f"Rejected {path}: {reason}", file=sys.stderr)
+            results.append(tuple(result))
+        self.failed = failed
+        changed, removed = self.apply(results, touched, removed, stale_rejected)
+        if results or removed or touched or stale_rejected or not os.path.exists(self.cache_path):
+            self.save()
+        return changed, removed
+
+    def default_threshold(self, metric="cosine"):
+        # DeepFace's own cutoff for this model: a single fixed value only suits one model
+        from deepface.modules.verification import find_threshold
+        return find_threshold(self.model_name, metric)
+
+    def warm_up(self):
+        # A blank frame with detection disabled still builds both the detector and the model
+        from deepface import DeepFace
+        DeepFace.build_model(self.model_name)
+        DeepFace.represent(
+            img_path=np.zeros((224, 224, 3), dtype=np.uint8),
+            model_name=self.model_name,
+            detector_backend=self.detector_backend,
+            enforce_detection=False
+        )
+
+    def represent_face(self, face):
+        # For crops that are already detected and aligned: skip straight to the model
+        from deepface import DeepFace
+        result = DeepFace.represent(
+            img_path=face,
+            model_name=self.model_name,
+            detector_backend="skip",
+            enforce_detection=False
+        )
+        return np.asarray(result[0]['embedding'], dtype=np.float32)
+
+    def represent_faces(self, faces):
+        # One forward pass for a batch of aligned crops, with the same resize and
+        # normalisation DeepFace.represent applies to a single "skip" image
+        from deepface import DeepFace
+        from deepface.modules import preprocessing
+        model = DeepFace.build_model(self.model_name)
+        network = getattr(model, 'model', None)
+        if not hasattr(network, 'predict'):
+            # Not a Keras graph (e.g. Dlib, SFace): these only take one image at a time
+            return [self.represent_face(face) for face in faces]
+        target_size = (model.input_shape[1], model.input_shape[0])
+        batch = np.concatenate([
+            preprocessing.normalize_input(
+                preprocessing.resize_image(face[:, :, ::-1], target_size)
+            )
+            for face in faces
+        ])
+        embeddings = network(batch, training=False).numpy().astype(np.float32)
+        if self.model_name == "VGG-Face":
+            # VGG-Face normalises its output outside the graph
+            embeddings = _l2_normalize(embeddings)
+        return list(embeddings)
+
+    def represent(self, img):
+        # Imported lazily: loading deepface (and TensorFlow) dominates startup time
+        from deepface import DeepFace
+        result = DeepFace.represent(
+            img_path=img,
+            model_name=self.model_name,
+            detector_backend=self.detector_backend,
+            enforce_detection=True
+        )
+        return np.asarray(result[0]['embedding'], dtype=np.float32)
+
+
+class GalleryWatcher(threading.Thread):
+    def __init__(self, gallery, on_change, interval=2.0):
+        super().__init__(daemon=True)
+        self.gallery = gallery
+        self.on_change = on_change
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._last_snapshot = None
+        self._last_error = None
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                snapshot = self.gallery.scan()
+                if snapshot != self._last_snapshot:
+                    changed, removed = self.gallery.sync(snapshot)
+                    if not self.gallery.failed:
+                        # Otherwise sync again on the next tick to retry the failed images
+                        self._last_snapshot = snapshot
+                    if changed or removed:
+                        self.on_change(changed, removed)
+            except OSError:
+                # db/ may be mid-copy; try again on the next tick
+                pass
+            except Exception as e:
+                # Keep watching; the same snapshot is retried on the next tick, logged once
+                error = f"{type(e).__name__}: {e}"
+                if error != self._last_error:
+                    print(f"Gallery sync failed: {error}", file=sys.stderr)
+                self._last_error = error
+            else:
+                self._last_error = None
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
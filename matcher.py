@@ -0,0 +1,206 @@
+import threading
+import numpy as np
+
+METRICS = ('cosine', 'euclidean', 'euclidean_l2')
+
+# Galleries larger than this get an IVF index instead of a full scan
+ANN_MIN_SIZE = 20000
+
+
+def _prepare(vectors, metric):
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    if metric in ('cosine', 'euclidean_l2'):
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+    return vectors
+
+
+def _distances(matrix, sq_norms, query, metric):
+    dots = matrix @ query
+    if metric == 'cosine':
+        return 1.0 - dots
+    # ||a - q||^2 = ||a||^2 - 2 a.q + ||q||^2, computed for every row at once
+    squared = sq_norms - 2.0 * dots + float(query @ query)
+    return np.sqrt(np.maximum(squared, 0.0))
+
+
+def _top_k(distances, k):
+    k = min(k, len(distances))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(distances):
+        idx = np.argpartition(distances, k - 1)[:k]
+    else:
+        idx = np.arange(len(distances))
+    return idx[np.argsort(distances[idx], kind='stable')]
+
+
+class BruteForceIndex:
+    def __init__(self, metric="cosine"):
+        if metric not in METRICS:
+            raise ValueError(f"Unsupported distance metric: {metric}")
+        self.metric = metric
+        self.lock = threading.RLock()
+        self.labels = np.empty(0, dtype=object)
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self.sq_norms = np.empty(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def build(self, labels, vectors):
+        with self.lock:
+            self._set(np.asarray(labels, dtype=object), _prepare(vectors, self.metric))
+        return self
+
+    def _set(self, labels, matrix):
+        self.labels = labels
+        self.matrix = matrix
+        self.sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+
+    def update(self, labels, vectors):
+        # Insert new labels and replace the vectors of existing ones
+        labels = list(labels)
+        if not labels:
+            return
+        with self.lock:
+            self._remove(labels)
+            self._append(np.asarray(labels, dtype=object), _prepare(vectors, self.metric))
+
+    def remove(self, labels):
+        labels = list(labels)
+        if not labels:
+            return
+        with self.lock:
+            self._remove(labels)
+
+    def _keep_mask(self, labels):
+        drop = set(labels)
+        return np.fromiter((label not in drop for label in self.labels), dtype=bool, count=len(self.labels))
+
+    def _remove(self, labels):
+        keep = self._keep_mask(labels)
+        if not keep.all():
+            self._set(self.labels[keep], self.matrix[keep])
+
+    def _append(self, labels, matrix):
+        if not len(self.labels):
+            self._set(labels, matrix)
+        else:
+            self._set(np.concatenate((self.labels, labels)), np.concatenate((self.matrix, matrix)))
+
+    def search(self, query, k=1):
+        with self.lock:
+            if not len(self.labels):
+                return []
+            query = _prepare(query, self.metric)[0]
+            distances = _distances(self.matrix, self.sq_norms, query, self.metric)
+            return [(self.labels[i], float(distances[i])) for i in _top_k(distances, k)]
+
+
+class IVFIndex(BruteForceIndex):
+    def __init__(self, metric="cosine", n_lists=None, n_probe=8, n_iter=10, seed=0):
+        super().__init__(metric)
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.seed = seed
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self.assignments = np.empty(0, dtype=np.int64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+
+    def build(self, labels, vectors):
+        labels = np.asarray(labels, dtype=object)
+        matrix = _prepare(vectors, self.metric)
+        with self.lock:
+            if not len(matrix):
+                self.centroids = np.empty((0, 0), dtype=np.float32)
+                self._set_lists(labels, matrix, np.empty(0, dtype=np.int64))
+                return self
+            n_lists = self.n_lists or max(1, int(np.sqrt(len(matrix))))
+            n_lists = min(n_lists, len(matrix))
+
+            self.centroids = self._train(matrix, n_lists)
+            self._set_lists(labels, matrix, self._assign(matrix))
+        return self
+
+    def _set_lists(self, labels, matrix, assignments):
+        # Store each inverted list as a contiguous block of the matrix
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=len(self.centroids))
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.assignments = assignments[order]
+        self._set(labels[order], matrix[order])
+
+    def _remove(self, labels):
+        keep = self._keep_mask(labels)
+        if not keep.all():
+            self._set_lists(self.labels[keep], self.matrix[keep], self.assignments[keep])
+
+    def _append(self, labels, matrix):
+        if not len(self.centroids):
+            # Nothing trained yet; the first vectors define the coarse lists
+            self.build(labels, matrix)
+            return
+        self._set_lists(
+            np.concatenate((self.labels, labels)),
+            np.concatenate((self.matrix, matrix)),
+            np.concatenate((self.assignments, self._assign(matrix)))
+        )
+
+    def _train(self, matrix, n_lists):
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(matrix), n_lists * 64)
+        sample = matrix[rng.choice(len(matrix), sample_size, replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+        for _ in range(self.n_iter):
+            self.centroids = centroids
+            assignments = self._assign(sample)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            counts = np.bincount(assignments, minlength=n_lists)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+            if self.metric != 'euclidean':
+                centroids = _prepare(centroids, self.metric)
+        return np.ascontiguousarray(centroids, dtype=np.float32)
+
+    def _assign(self, matrix, chunk=8192):
+        c_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+        assignments = np.empty(len(matrix), dtype=np.int64)
+        for start in range(0, len(matrix), chunk):
+            block = matrix[start:start + chunk]
+            # argmin ||x - c||^2 == argmin (||c||^2 - 2 x.c)
+            scores = c_norms[None, :] - 2.0 * (block @ self.centroids.T)
+            assignments[start:start + chunk] = np.argmin(scores, axis=1)
+        return assignments
+
+    def search(self, query, k=1):
+        with self.lock:
+            if not len(self.labels):
+                return []
+            query = _prepare(query, self.metric)[0]
+            c_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+            scores = c_norms - 2.0 * (self.centroids @ query)
+            probe_lists = _top_k(scores, self.n_probe)
+
+            rows = np.concatenate([
+                np.arange(self.offsets[i], self.offsets[i + 1]) for i in probe_lists
+            ])
+            if not len(rows):
+                return []
+            distances = _distances(self.matrix[rows], self.sq_norms[rows], query, self.metric)
+            return [(self.labels[rows[i]], float(distances[i])) for i in _top_k(distances, k)]
+
+
+def build_index(labels, vectors, metric="cosine", kind="auto", **kwargs):
+    if kind == "auto":
+        kind = "ivf" if len(labels) >= ANN_MIN_SIZE else "brute"
+    if kind == "ivf":
+        return IVFIndex(metric, **kwargs).build(labels, vectors)
+    if kind == "brute":
+        return BruteForceIndex(metric).build(labels, vectors)
+    raise ValueError(f"Unknown index kind: {kind}")
@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class SpanStats:
+    # Percentiles come from the most recent `window` samples; count and total are lifetime
+    def __init__(self, window=1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+
+class Metrics:
+    def __init__(self, window=1024):
+        self.window = window
+        self.spans = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self.lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = SpanStats(self.window)
+            stats.add(seconds)
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        # {name: {'count', 'total', 'mean', 0.5, 0.95, 0.99}} with times in seconds
+        with self.lock:
+            copies = {
+                name: (np.array(stats.samples), stats.count, stats.total)
+                for name, stats in self.spans.items()
+            }
+        snapshot = {}
+        for name, (samples, count, total) in sorted(copies.items()):
+            row = {'count': count, 'total': total, 'mean': total / count if count else 0.0}
+            if len(samples):
+                row.update(zip(QUANTILES, np.quantile(samples, QUANTILES).tolist()))
+            snapshot[name] = row
+        return snapshot
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP attendance_span_seconds Time spent in each pipeline stage "
+            "(quantiles over the most recent samples).",
+            "# TYPE attendance_span_seconds summary"
+        ]
+        for name, row in self.snapshot().items():
+            for quantile in QUANTILES:
+                if quantile in row:
+                    lines.append(
+                        f'attendance_span_seconds{{span="{name}",quantile="{quantile}"}} {row[quantile]:.6f}'
+                    )
+            lines.append(f'attendance_span_seconds_sum{{span="{name}"}} {row["total"]:.6f}')
+            lines.append(f'attendance_span_seconds_count{{span="{name}"}} {row["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # Atomic, so a textfile collector never reads half a file
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(temp_path, path)
+
+    def reset(self):
+        with self.lock:
+            self.spans = {}
+
+
+# Process-wide registry the pipeline modules record into
+METRICS = Metrics()
+
+
+def span(name):
+    return METRICS.span(name)
+
+
+class MetricsServer(threading.Thread):
+    # Serves the registry as Prometheus text on http://127.0.0.1:<port>/metrics
+    def __init__(self, port, metrics=METRICS):
+        super().__init__(daemon=True)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+
+    def run(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,18 +1,53 @@
+import time
+_IMPORT_START = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox
-import cv2
-from deepface import DeepFace
-from PIL import Image, ImageTk
-import os
-from datetime import datetime, timedelta
-import json
-import pandas as pd
-import plotly.express as px
-import webbrowser
+from PIL import ImageTk
+from datetime import datetime
+import sys
+import threading
+import queue
+from gallery import GALLERY_DIR, EmbeddingGallery, GalleryWatcher, identity_for
+from capture import CaptureWorker, RateCounter
+from verifier import ProbeCache, VerificationService, build_template_index
+from quality import QualityError, QualityGate
+from tracking import HandsFreeRecognizer
+from attendance_store import open_attendance_store
+from settings import SettingsStore
+from metrics import METRICS, QUANTILES, MetricsServer, span
+
+# Settings the running pipeline picks up in place; any other change restarts hands-free mode
+LIVE_SETTINGS = {
+    'working_hours', 'late_threshold', 'preview_resolution', 'frame_skip',
+    'metrics_file', 'metrics_port'
+}
+# Saved now, used from the next start (the history is moved across when the backend changes)
+RESTART_SETTINGS = {'attendance_backend'}
+
+class StartupTimer:
+    def __init__(self, start):
+        self.start = start
+        self.last = start
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self, title):
+        lines = [f"{title}:"]
+        lines += [f"  {phase:<24}{seconds * 1000:9.1f} ms" for phase, seconds in self.phases]
+        lines.append(f"  {'total':<24}{(self.last - self.start) * 1000:9.1f} ms")
+        print("\n".join(lines), file=sys.stderr)
 
 class ModernAttendanceSystem(tk.Tk):
     def __init__(self):
+        self.startup = StartupTimer(_IMPORT_START)
+        self.startup.mark("imports")
         super().__init__()
+        self.startup.mark("tk init")
         
         self.title("Enterprise Attendance System")
         self.configure(bg="#0f172a")
@@ -35,15 +70,119 @@ class ModernAttendanceSystem(tk.Tk):
             'border': '#2d3748'
         }
         
-        self.db_path = "db"
-        self.camera = None
+        self.db_path = GALLERY_DIR
+        # One capture worker per configured device; self.capture is the one being previewed
+        self.captures = []
+        self.capture = None
         self.camera_active = False
+        # Why the configured cameras could not be opened, shown on the home page until they open
+        self.camera_error = None
+        self.display_fps = RateCounter()
+        # One PhotoImage for the whole session; new frames are pasted into it
+        self.preview_photo = None
+        self.last_stats_update = 0.0
         self.current_page = "home"
         
+        self.settings = SettingsStore()
+        self.settings.load()
+        for key, error in self.settings.errors.items():
+            print(f"Ignoring saved setting {key}: {error}", file=sys.stderr)
+        self.settings.subscribe(self._apply_settings)
+        self.startup.mark("settings")
+        self.top_k = 5
+        self.verification_service = None
+        self.pending_jobs = []
+        self.recognizers = []
+        self.handsfree_events = queue.Queue()
+        self.handsfree_seen = {}
+        self.handsfree_lock = threading.Lock()
+        self.attendance = open_attendance_store(self.settings['attendance_backend'])
+        # Check-ins append straight away; the history is indexed off the Tk thread
+        self.attendance.load_in_background()
+        self.startup.mark("attendance store")
+        # pandas and the report frame are built off the Tk thread once the history is indexed
+        self.reports = None
+        self.reports_error = None
+        self.reports_ready = threading.Event()
+        threading.Thread(target=self._build_report_engine, daemon=True).start()
+        today = datetime.now()
+        self.report_start = tk.StringVar(value=today.replace(day=1).strftime("%Y-%m-%d"))
+        self.report_end = tk.StringVar(value=today.strftime("%Y-%m-%d"))
+        self.report_format = tk.StringVar(value="txt")
+        
+        # Start matching against the cached embeddings right away; the watcher
+        # re-embeds only images added, edited or removed since the last run
+        self.gallery = EmbeddingGallery(
+            self.db_path, self.settings['model_name'], self.settings['detector_backend']
+        )
+        self.gallery.load()
+        self._rebuild_index()
+        self.gallery_events = queue.Queue()
+        self.gallery_watcher = GalleryWatcher(self.gallery, self._on_gallery_change)
+        self.gallery_watcher.start()
+        self.startup.mark("gallery cache")
+        
+        # Build the detector and recognition model once, off the Tk thread,
+        # so the first check-in doesn't pay for it
+        self.model_ready = False
+        self.warmup_seconds = None
+        self.warmup_error = None
+        threading.Thread(target=self._warm_up_model, daemon=True).start()
+        
         self._create_styles()
         self._create_widgets()
         self._create_layout()
         self._create_navigation()
+        self.startup.mark("widgets")
+        self.after(500, self._poll_gallery_events)
+        self.after(1000, self._poll_settings)
+        self.metrics_server = None
+        self.metrics_error = None
+        self.performance_job = None
+        self.statistics_job = None
+        self.statistics_shown = None
+        self._start_metrics_server()
+        self.after(5000, self._export_metrics)
+        self.after_idle(self._on_window_ready)
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+
+    def _on_window_ready(self):
+        self.update_idletasks()
+        self.startup.mark("first paint")
+        self.startup.report("Startup timing")
+        self._poll_warmup()
+
+    def _warm_up_model(self):
+        start = time.perf_counter()
+        try:
+            self.gallery.warm_up()
+        except Exception as e:
+            self.warmup_error = str(e)
+        self.warmup_seconds = time.perf_counter() - start
+        self.model_ready = True
+
+    def _poll_warmup(self):
+        if not self.model_ready:
+            self.after(250, self._poll_warmup)
+            return
+        if self.warmup_error:
+            print(f"Model warm-up failed: {self.warmup_error}", file=sys.stderr)
+        else:
+            print(f"Model warm-up (background): {self.warmup_seconds * 1000:.1f} ms", file=sys.stderr)
+
+    def _build_report_engine(self):
+        # The first frame build walks the whole history (seconds for a large log), so the
+        # report buttons only have to append the check-ins that arrived since
+        self.attendance.loaded.wait()
+        try:
+            from reports import ReportEngine
+            reports = ReportEngine(self.attendance)
+            reports.frame()
+            self.reports = reports
+        except Exception as e:
+            self.reports_error = f"{type(e).__name__}: {e}"
+            print(f"Report engine failed to load: {self.reports_error}", file=sys.stderr)
+        self.reports_ready.set()
 
     def _create_styles(self):
         style = ttk.Style()
@@ -70,6 +209,7 @@ class ModernAttendanceSystem(tk.Tk):
             'Card.TFrame',
             background=self.colors['card']
         )
+        style.configure('Invalid.TEntry', foreground=self.colors['error'])
 
     def _create_navigation(self):
         self.nav_frame = tk.Frame(self.main_frame, bg=self.colors['card_dark'])
@@ -79,6 +219,7 @@ class ModernAttendanceSystem(tk.Tk):
             ("Home", self.show_home_page),
             ("Statistics", self.show_statistics_page),
             ("Reports", self.show_reports_page),
+            ("Performance", self.show_performance_page),
             ("Settings", self.show_settings_page)
         ]
         
@@ -133,14 +274,40 @@ class ModernAttendanceSystem(tk.Tk):
             command=self.verify_face,
             state='disabled'
         )
+        self.handsfree_btn = ttk.Button(
+            self.controls_frame,
+            text="Hands-free Mode",
+            style='Secondary.TButton',
+            command=self.toggle_handsfree,
+            state='disabled'
+        )
+        self.cancel_btn = ttk.Button(
+            self.controls_frame,
+            text="Cancel",
+            style='Error.TButton',
+            command=self.cancel_verification
+        )
+        self.switch_camera_btn = ttk.Button(
+            self.controls_frame,
+            text="Next Camera",
+            style='Secondary.TButton',
+            command=self.switch_camera
+        )
+        self.camera_stats_label = tk.Label(
+            self.controls_frame,
+            text="",
+            bg=self.colors['card'],
+            fg=self.colors['subtext'],
+            font=('Inter', 11)
+        )
         
         self.status_label = tk.Label(
             self.content_frame,
-            text="Welcome to the Enterprise Attendance System",
+            text=self.camera_error or "Welcome to the Enterprise Attendance System",
             wraplength=800,
             justify="center",
             bg=self.colors['card'],
-            fg=self.colors['text'],
+            fg=self.colors['error'] if self.camera_error else self.colors['text'],
             font=('Inter', 14)
         )
         
@@ -152,29 +319,47 @@ class ModernAttendanceSystem(tk.Tk):
         self.controls_frame.pack(fill='x', pady=20, padx=20)
         self.toggle_camera_btn.pack(side='left', padx=5)
         self.verify_btn.pack(side='left', padx=5)
+        self.handsfree_btn.pack(side='left', padx=5)
+        self.camera_stats_label.pack(side='right', padx=5)
         self.status_label.pack(fill='x', pady=20, padx=20)
+        # Cameras, hands-free workers and verification jobs keep running while other
+        # pages are shown, so the rebuilt controls have to match them
+        self._update_camera_controls()
 
     def show_statistics_page(self):
         self.current_page = "statistics"
         self._clear_main_content()
         
-        stats_frame = ttk.Frame(self.content_frame, style='Card.TFrame')
-        stats_frame.pack(fill='both', expand=True, padx=20, pady=20)
-        
-        # Generate attendance statistics
-        attendance_data = self._load_attendance_data()
-        if attendance_data:
-            self._generate_attendance_charts(stats_frame, attendance_data)
-        else:
+        self.statistics_frame = ttk.Frame(self.content_frame, style='Card.TFrame')
+        self.statistics_frame.pack(fill='both', expand=True, padx=20, pady=20)
+        self.statistics_shown = None
+        if not self.attendance.loaded.is_set():
             tk.Label(
-                stats_frame,
-                text="No attendance data available",
+                self.statistics_frame,
+                text="Loading attendance history...",
                 bg=self.colors['card'],
                 fg=self.colors['text'],
                 font=('Inter', 14)
             ).pack(pady=20)
+        self._refresh_statistics()
+
+    def _refresh_statistics(self):
+        # The store hands back the same cached summary until a check-in arrives,
+        # so the page is only redrawn when something actually changed
+        if self.statistics_job is not None:
+            self.after_cancel(self.statistics_job)
+            self.statistics_job = None
+        if self.current_page != "statistics":
+            return
+        if self.attendance.loaded.is_set():
+            stats = self.attendance.statistics(datetime.now().strftime("%Y-%m-%d"))
+            if stats is not self.statistics_shown:
+                self.statistics_shown = stats
+                self._draw_statistics(stats)
+        self.statistics_job = self.after(2000, self._refresh_statistics)
 
     def show_reports_page(self):
+        from reports import REPORT_FORMATS
         self.current_page = "reports"
         self._clear_main_content()
         
@@ -190,11 +375,38 @@ class ModernAttendanceSystem(tk.Tk):
             fg=self.colors['text']
         ).pack(pady=10)
         
+        range_frame = tk.Frame(reports_frame, bg=self.colors['card'])
+        range_frame.pack(pady=10)
+        for label, var in (("From", self.report_start), ("To", self.report_end)):
+            tk.Label(
+                range_frame,
+                text=label,
+                bg=self.colors['card'],
+                fg=self.colors['text'],
+                font=('Inter', 12)
+            ).pack(side='left', padx=5)
+            ttk.Entry(range_frame, textvariable=var, width=12).pack(side='left', padx=5)
+        tk.Label(
+            range_frame,
+            text="Format",
+            bg=self.colors['card'],
+            fg=self.colors['text'],
+            font=('Inter', 12)
+        ).pack(side='left', padx=5)
+        ttk.Combobox(
+            range_frame,
+            textvariable=self.report_format,
+            values=REPORT_FORMATS,
+            state='readonly',
+            width=8
+        ).pack(side='left', padx=5)
+        
         report_types = [
             ("Daily Attendance Report", self.generate_daily_report),
             ("Monthly Summary", self.generate_monthly_report),
             ("Late Arrivals Report", self.generate_late_report),
-            ("Export All Data (CSV)", self.export_attendance_data)
+            ("Absence Report", self.generate_absence_report),
+            ("Export All Data", self.export_attendance_data)
         ]
         
         for text, command in report_types:
@@ -205,6 +417,114 @@ class ModernAttendanceSystem(tk.Tk):
                 command=command
             ).pack(pady=5)
 
+    def show_performance_page(self):
+        self.current_page = "performance"
+        self._clear_main_content()
+        
+        performance_frame = ttk.Frame(self.content_frame, style='Card.TFrame')
+        performance_frame.pack(fill='both', expand=True, padx=20, pady=20)
+        
+        tk.Label(
+            performance_frame,
+            text="Performance",
+            font=('Inter', 18, 'bold'),
+            bg=self.colors['card'],
+            fg=self.colors['text']
+        ).pack(pady=10)
+        
+        self.performance_table = tk.Frame(performance_frame, bg=self.colors['card'])
+        self.performance_table.pack(pady=10)
+        
+        exports = []
+        if self.settings['metrics_file']:
+            exports.append(f"written to {self.settings['metrics_file']} every 5 s")
+        if self.metrics_server is not None:
+            exports.append(f"served at http://127.0.0.1:{self.settings['metrics_port']}/metrics")
+        tk.Label(
+            performance_frame,
+            text="Prometheus metrics " + " and ".join(exports) if exports else "Metrics export is off",
+            bg=self.colors['card'],
+            fg=self.colors['subtext'],
+            font=('Inter', 11)
+        ).pack(pady=5)
+        ttk.Button(
+            performance_frame,
+            text="Reset",
+            style='Secondary.TButton',
+            command=self._reset_performance
+        ).pack(pady=10)
+        self._refresh_performance()
+
+    def _refresh_performance(self):
+        # Redrawn once a second while the page is open
+        if self.performance_job is not None:
+            self.after_cancel(self.performance_job)
+            self.performance_job = None
+        if self.current_page != "performance":
+            return
+        for widget in self.performance_table.winfo_children():
+            widget.destroy()
+        
+        headers = ("Stage", "Count", "Mean") + tuple(f"p{round(q * 100)}" for q in QUANTILES)
+        rows = [
+            (name, str(row['count']), row['mean'])
+            + tuple(row.get(q) for q in QUANTILES)
+            for name, row in METRICS.snapshot().items()
+        ]
+        if not rows:
+            rows = [("No timings yet",) + ("",) * (len(headers) - 1)]
+        for column, header in enumerate(headers):
+            tk.Label(
+                self.performance_table,
+                text=header,
+                bg=self.colors['card'],
+                fg=self.colors['subtext'],
+                font=('Inter', 12, 'bold')
+            ).grid(row=0, column=column, sticky='e' if column else 'w', padx=12, pady=4)
+        for row_number, row in enumerate(rows, 1):
+            for column, value in enumerate(row):
+                if isinstance(value, float):
+                    value = f"{value * 1000:.1f} ms"
+                tk.Label(
+                    self.performance_table,
+                    text=value if value is not None else "-",
+                    bg=self.colors['card'],
+                    fg=self.colors['text'],
+                    font=('Inter', 12)
+                ).grid(row=row_number, column=column, sticky='e' if column else 'w', padx=12, pady=2)
+        self.performance_job = self.after(1000, self._refresh_performance)
+
+    def _reset_performance(self):
+        METRICS.reset()
+        self._refresh_performance()
+
+    def _export_metrics(self):
+        path = self.settings['metrics_file']
+        if path:
+            try:
+                METRICS.write_prometheus(path)
+                self.metrics_error = None
+            except OSError as e:
+                # Report a failing path once, not every 5 seconds
+                if str(e) != self.metrics_error:
+                    print(f"Could not write metrics to {path}: {e}", file=sys.stderr)
+                self.metrics_error = str(e)
+        self.after(5000, self._export_metrics)
+
+    def _start_metrics_server(self):
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        port = self.settings['metrics_port']
+        if not port:
+            return
+        try:
+            self.metrics_server = MetricsServer(port)
+        except OSError as e:
+            print(f"Could not serve metrics on port {port}: {e}", file=sys.stderr)
+            return
+        self.metrics_server.start()
+
     def show_settings_page(self):
         self.current_page = "settings"
         self._clear_main_content()
@@ -220,29 +540,148 @@ class ModernAttendanceSystem(tk.Tk):
             fg=self.colors['text']
         ).pack(pady=10)
         
-        # Add settings options
-        settings = [
-            ("Working Hours", "09:00-17:00"),
-            ("Late Threshold (minutes)", "15"),
-            ("Camera Device", "0"),
-            ("Verification Threshold", "0.6")
-        ]
-        
-        for setting, default in settings:
-            frame = tk.Frame(settings_frame, bg=self.colors['card'])
-            frame.pack(fill='x', pady=5, padx=20)
-            
+        # Two columns so every knob fits on screen. Entries turn red while they do not
+        # parse, and a value is only applied on Enter or when the entry loses focus
+        grid = tk.Frame(settings_frame, bg=self.colors['card'])
+        grid.pack(fill='x', padx=20)
+        keys = list(self.settings.schema)
+        rows = (len(keys) + 1) // 2
+        for position, key in enumerate(keys):
+            row, column = position % rows, (position // rows) * 2
             tk.Label(
-                frame,
-                text=setting,
+                grid,
+                text=self.settings.label(key),
                 bg=self.colors['card'],
                 fg=self.colors['text'],
                 font=('Inter', 12)
-            ).pack(side='left')
+            ).grid(row=row, column=column, sticky='w', padx=(0, 10), pady=5)
             
-            entry = ttk.Entry(frame)
-            entry.insert(0, default)
-            entry.pack(side='right')
+            var = tk.StringVar(value=self.settings.raw[key])
+            entry = ttk.Entry(grid, textvariable=var)
+            entry.grid(row=row, column=column + 1, sticky='ew', padx=(0, 30), pady=5)
+            var.trace_add(
+                'write',
+                lambda *_, key=key, var=var, entry=entry: self._check_setting(key, var.get(), entry)
+            )
+            for sequence in ('<Return>', '<FocusOut>'):
+                entry.bind(
+                    sequence,
+                    lambda _, key=key, var=var, entry=entry: self._commit_setting(key, var.get(), entry)
+                )
+        
+        self.settings_error_label = tk.Label(
+            settings_frame,
+            text="",
+            bg=self.colors['card'],
+            fg=self.colors['error'],
+            font=('Inter', 11)
+        )
+        self.settings_error_label.pack(pady=10)
+
+    def _check_setting(self, key, text, entry):
+        try:
+            self.settings.parse(key, text)
+        except ValueError as e:
+            entry.configure(style='Invalid.TEntry')
+            self.settings_error_label.config(text=f"{self.settings.label(key)}: {e}")
+            return False
+        entry.configure(style='TEntry')
+        self.settings_error_label.config(text="")
+        return True
+
+    def _commit_setting(self, key, text, entry):
+        # Half-typed values (a partial URL, port or resolution) never reach the pipeline
+        if text.strip() == self.settings.raw[key] or not self._check_setting(key, text, entry):
+            return
+        self.settings.set(key, text)
+        threshold = self.settings['verification_threshold']
+        if key in RESTART_SETTINGS:
+            self.settings_error_label.config(
+                text=f"{self.settings.label(key)} takes effect the next time the app starts."
+            )
+        elif key == 'model_name' and threshold is not None:
+            self.settings_error_label.config(
+                text=f"Verification Threshold stays at {threshold:g}, which may not suit "
+                     f"{self.settings['model_name']}. Set it to auto to use the model's default."
+            )
+
+    def _poll_settings(self):
+        # Picks up hand edits to settings.json without a restart
+        if self.settings.reload_if_changed() and self.current_page == "settings":
+            self.show_settings_page()
+        self.after(1000, self._poll_settings)
+
+    def _apply_settings(self, changed):
+        changed = set(changed)
+        if changed & {'model_name', 'detector_backend'}:
+            self._switch_gallery()
+        if 'metrics_port' in changed:
+            self._start_metrics_server()
+        
+        handsfree = bool(self.recognizers)
+        if self.camera_active and 'camera_device' in changed:
+            self._restart_cameras()
+        else:
+            for capture in self.captures:
+                capture.preview_size = self.settings['preview_resolution']
+        if self.recognizers and changed - LIVE_SETTINGS - RESTART_SETTINGS:
+            self._stop_handsfree()
+        for recognizer in self.recognizers:
+            recognizer.detect_every = self.settings['frame_skip']
+        if handsfree and self.camera_active and not self.recognizers:
+            self._start_handsfree()
+            self._update_camera_controls()
+
+    def _switch_gallery(self):
+        # Embeddings from one model mean nothing to another: load that model's own cache
+        self.gallery_watcher.stop()
+        if self.verification_service is not None:
+            self.verification_service.shutdown()
+            self.verification_service = None
+        self.gallery = EmbeddingGallery(
+            self.db_path, self.settings['model_name'], self.settings['detector_backend']
+        )
+        self.gallery.load()
+        self._rebuild_index()
+        self.gallery_watcher = GalleryWatcher(self.gallery, self._on_gallery_change)
+        self.gallery_watcher.start()
+        self.model_ready = False
+        self.warmup_error = None
+        threading.Thread(target=self._warm_up_model, daemon=True).start()
+        self._poll_warmup()
+
+    def _template_config(self):
+        return self.settings['template_strategy'], self.settings['max_templates'] or None
+
+    def _rebuild_index(self):
+        self.index_config = self._template_config()
+        self.index = build_template_index(self.gallery, *self.index_config)
+
+    def _on_gallery_change(self, changed, removed):
+        # Runs on the watcher thread; only the templates of affected people are rebuilt
+        affected = {identity_for(self.db_path, path) for path in changed + removed}
+        labels, vectors = self.gallery.templates(affected, *self.index_config)
+        index = self.index
+        with index.lock:
+            index.remove(affected)
+            index.update(labels, vectors)
+        service = self.verification_service
+        if service is not None and service.cache is not None:
+            service.cache.clear()
+        self.gallery_events.put((len(changed), len(removed)))
+
+    def _poll_gallery_events(self):
+        try:
+            while True:
+                changed, removed = self.gallery_events.get_nowait()
+                if self.current_page == "home" and not self.camera_active:
+                    self.status_label.config(
+                        text=f"Gallery updated: {changed} added or changed, {removed} removed",
+                        fg=self.colors['subtext']
+                    )
+        except queue.Empty:
+            pass
+        self.after(500, self._poll_gallery_events)
 
     def _clear_main_content(self):
         for widget in self.content_frame.winfo_children():
@@ -295,11 +734,34 @@ class ModernAttendanceSystem(tk.Tk):
             state='disabled'
         )
         
-        self.try_again_btn = ttk.Button(
+        self.handsfree_btn = ttk.Button(
+            self.controls_frame,
+            text="Hands-free Mode",
+            style='Secondary.TButton',
+            command=self.toggle_handsfree,
+            state='disabled'
+        )
+        
+        self.cancel_btn = ttk.Button(
+            self.controls_frame,
+            text="Cancel",
+            style='Error.TButton',
+            command=self.cancel_verification
+        )
+        
+        self.switch_camera_btn = ttk.Button(
             self.controls_frame,
-            text="Try Again",
+            text="Next Camera",
             style='Secondary.TButton',
-            command=self.reset_system
+            command=self.switch_camera
+        )
+        
+        self.camera_stats_label = tk.Label(
+            self.controls_frame,
+            text="",
+            bg=self.colors['card'],
+            fg=self.colors['subtext'],
+            font=('Inter', 11)
         )
         
         # Status with improved visibility
@@ -329,203 +791,583 @@ class ModernAttendanceSystem(tk.Tk):
         self.controls_frame.pack(fill='x', pady=20, padx=20)
         self.toggle_camera_btn.pack(side='left', padx=5)
         self.verify_btn.pack(side='left', padx=5)
+        self.handsfree_btn.pack(side='left', padx=5)
+        self.camera_stats_label.pack(side='right', padx=5)
         
         # Status
         self.status_label.pack(fill='x', pady=20, padx=20)
 
-    def _generate_attendance_charts(self, parent_frame, data):
-        # Convert attendance data to pandas DataFrame
-        df = pd.DataFrame(data).transpose()
+    def _draw_statistics(self, stats):
+        for widget in self.statistics_frame.winfo_children():
+            widget.destroy()
         
-        # Daily attendance chart
-        daily_attendance = len(df.columns)
         tk.Label(
-            parent_frame,
-            text=f"Today's Attendance: {daily_attendance}",
+            self.statistics_frame,
+            text="Attendance Statistics",
+            font=('Inter', 18, 'bold'),
             bg=self.colors['card'],
-            fg=self.colors['text'],
-            font=('Inter', 16, 'bold')
+            fg=self.colors['text']
         ).pack(pady=10)
+        if not stats['total']:
+            tk.Label(
+                self.statistics_frame,
+                text="No attendance data available",
+                bg=self.colors['card'],
+                fg=self.colors['text'],
+                font=('Inter', 14)
+            ).pack(pady=20)
+            return
+        
+        tiles = tk.Frame(self.statistics_frame, bg=self.colors['card'])
+        tiles.pack(pady=10)
+        for label, value in (
+            ("Today's Attendance", stats['today']),
+            ("Total Check-ins", stats['total']),
+            ("Days Recorded", stats['days']),
+            ("People Seen", stats['people']),
+            ("Average per Day", f"{stats['average']:.1f}")
+        ):
+            tile = tk.Frame(tiles, bg=self.colors['card_dark'], padx=18, pady=10)
+            tile.pack(side='left', padx=6)
+            tk.Label(
+                tile,
+                text=value,
+                bg=self.colors['card_dark'],
+                fg=self.colors['text'],
+                font=('Inter', 20, 'bold')
+            ).pack()
+            tk.Label(
+                tile,
+                text=label,
+                bg=self.colors['card_dark'],
+                fg=self.colors['subtext'],
+                font=('Inter', 10)
+            ).pack()
         
-        # Create attendance trends chart
-        fig = px.line(
-            x=df.index,
-            y=[len(day) for day in df.values],
-            title="Attendance Trends",
-            labels={'x': 'Date', 'y': 'Attendance Count'}
+        self._draw_trend_chart(stats['trend'])
+        self._draw_top_chart(stats['top'])
+
+    def _draw_trend_chart(self, trend, width=760, height=230):
+        tk.Label(
+            self.statistics_frame,
+            text=f"Attendance Trend (last {len(trend)} recorded days)",
+            bg=self.colors['card'],
+            fg=self.colors['text'],
+            font=('Inter', 13, 'bold')
+        ).pack(pady=(15, 5))
+        canvas = tk.Canvas(
+            self.statistics_frame,
+            width=width,
+            height=height,
+            bg=self.colors['card_dark'],
+            highlightthickness=0
         )
-        fig.write_html("attendance_chart.html")
-        ttk.Button(
-            parent_frame,
-            text="View Attendance Trends",
-            style='Primary.TButton',
-            command=lambda: webbrowser.open('attendance_chart.html')
-        ).pack(pady=10)
+        canvas.pack()
+        
+        left, right, top, bottom = 40, 10, 20, height - 30
+        peak = max(count for _, count in trend)
+        slot = (width - left - right) / len(trend)
+        label_every = max(1, len(trend) // 10)
+        canvas.create_line(left, bottom, width - right, bottom, fill=self.colors['border'])
+        canvas.create_text(left - 6, top, text=str(peak), anchor='e', fill=self.colors['subtext'])
+        canvas.create_text(left - 6, bottom, text="0", anchor='e', fill=self.colors['subtext'])
+        for i, (date, count) in enumerate(trend):
+            x0 = left + i * slot + slot * 0.15
+            x1 = left + (i + 1) * slot - slot * 0.15
+            y0 = bottom - (bottom - top) * count / peak
+            canvas.create_rectangle(x0, y0, x1, bottom, fill=self.colors['primary'], outline='')
+            if slot >= 18:
+                canvas.create_text((x0 + x1) / 2, y0 - 8, text=str(count), fill=self.colors['text'])
+            if i % label_every == 0 or i == len(trend) - 1:
+                canvas.create_text(
+                    (x0 + x1) / 2, bottom + 14, text=date[5:], fill=self.colors['subtext']
+                )
+
+    def _draw_top_chart(self, top_people, width=760, row_height=22):
+        tk.Label(
+            self.statistics_frame,
+            text="Most Days Present",
+            bg=self.colors['card'],
+            fg=self.colors['text'],
+            font=('Inter', 13, 'bold')
+        ).pack(pady=(15, 5))
+        canvas = tk.Canvas(
+            self.statistics_frame,
+            width=width,
+            height=row_height * len(top_people) + 10,
+            bg=self.colors['card_dark'],
+            highlightthickness=0
+        )
+        canvas.pack()
+        
+        left, right = 180, 50
+        peak = top_people[0][1]
+        for i, (name, days) in enumerate(top_people):
+            y = 5 + i * row_height
+            canvas.create_text(left - 10, y + row_height / 2, text=name, anchor='e', fill=self.colors['text'])
+            x1 = left + (width - left - right) * days / peak
+            canvas.create_rectangle(
+                left, y + 4, x1, y + row_height - 4, fill=self.colors['success'], outline=''
+            )
+            canvas.create_text(
+                x1 + 6, y + row_height / 2, text=str(days), anchor='w', fill=self.colors['subtext']
+            )
+
+    def _attendance_loading(self):
+        # Reports read the whole history, so they wait for the background load and frame build
+        if not self.reports_ready.is_set():
+            messagebox.showinfo("Please Wait", "Attendance history is still loading. Try again in a moment.")
+            return True
+        if self.reports is None:
+            messagebox.showerror("Reports Unavailable", self.reports_error)
+            return True
+        return False
+
+    def _report_range(self):
+        start = datetime.strptime(self.report_start.get(), "%Y-%m-%d")
+        end = datetime.strptime(self.report_end.get(), "%Y-%m-%d")
+        return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+    def _report_roster(self):
+        return self.gallery.names() | set(self.attendance.summary()[1])
 
-    def _load_attendance_data(self):
-        if os.path.exists("attendance.json"):
-            with open("attendance.json", 'r') as f:
-                return json.load(f)
-        return {}
+    def _write_report(self, frame, basename, **kwargs):
+        from reports import write_report
+        filename = f"{basename}.{self.report_format.get()}"
+        try:
+            with span("report_write"):
+                write_report(frame, filename, **kwargs)
+        except (ImportError, OSError, ValueError) as e:
+            messagebox.showerror("Export Failed", str(e))
+            return None
+        return filename
 
     def generate_daily_report(self):
-        data = self._load_attendance_data()
+        if self._attendance_loading():
+            return
         today = datetime.now().strftime("%Y-%m-%d")
+        records = self.reports.records(today, today)
         
-        if today in data:
-            report = f"Daily Attendance Report - {today}\n\n"
-            for name, time in data[today].items():
-                report += f"{name}: {time}\n"
-            
-            self._save_report(report, f"daily_report_{today}.txt")
-            messagebox.showinfo("Success", "Daily report generated successfully!")
+        if len(records):
+            filename = self._write_report(
+                records[['name', 'time']],
+                f"daily_report_{today}",
+                title=f"Daily Attendance Report - {today}"
+            )
+            if filename:
+                messagebox.showinfo("Success", f"Daily report saved to {filename}")
         else:
             messagebox.showwarning("No Data", "No attendance records for today.")
 
     def generate_monthly_report(self):
-        data = self._load_attendance_data()
-        current_month = datetime.now().strftime("%Y-%m")
-        
-        monthly_data = {date: records for date, records in data.items() 
-                       if date.startswith(current_month)}
-        
-        if monthly_data:
-            report = f"Monthly Attendance Report - {current_month}\n\n"
-            for date, records in monthly_data.items():
-                report += f"\nDate: {date}\n"
-                for name, time in records.items():
-                    report += f"{name}: {time}\n"
-            
-            self._save_report(report, f"monthly_report_{current_month}.txt")
-            messagebox.showinfo("Success", "Monthly report generated successfully!")
+        if self._attendance_loading():
+            return
+        try:
+            start, end = self._report_range()
+        except ValueError:
+            messagebox.showwarning("Invalid Range", "Dates must be in YYYY-MM-DD format.")
+            return
+        
+        if len(self.reports.records(start, end)):
+            summary = self.reports.summary(
+                start, end,
+                self.settings['working_hours'],
+                self.settings['late_threshold'],
+                roster=self._report_roster()
+            )
+            filename = self._write_report(
+                summary,
+                f"monthly_report_{start}_{end}",
+                title=f"Attendance Summary - {start} to {end}\n"
+                      "name: days present, late days, days absent, mean arrival"
+            )
+            if filename:
+                messagebox.showinfo("Success", f"Summary report saved to {filename}")
         else:
-            messagebox.showwarning("No Data", "No attendance records for this month.")
+            messagebox.showwarning("No Data", "No attendance records in the selected range.")
 
     def generate_late_report(self):
-        data = self._load_attendance_data()
-        today = datetime.now().strftime("%Y-%m-%d")
+        if self._attendance_loading():
+            return
+        try:
+            start, end = self._report_range()
+        except ValueError:
+            messagebox.showwarning("Invalid Range", "Dates must be in YYYY-MM-DD format.")
+            return
         
-        if today in data:
-            late_threshold = timedelta(minutes=15)  # Configurable in settings
-            start_time = datetime.strptime("09:00:00", "%H:%M:%S")  # Configurable
-            
-            report = f"Late Arrivals Report - {today}\n\n"
-            late_count = 0
-            
-            for name, time_str in data[today].items():
-                arrival_time = datetime.strptime(time_str, "%H:%M:%S")
-                if arrival_time.time() > (start_time + late_threshold).time():
-                    report += f"{name}: {time_str} (Late)\n"
-                    late_count += 1
-            
-            if late_count > 0:
-                self._save_report(report, f"late_report_{today}.txt")
-                messagebox.showinfo("Success", "Late arrivals report generated!")
-            else:
-                messagebox.showinfo("No Late Arrivals", "No late arrivals today!")
+        if not len(self.reports.records(start, end)):
+            messagebox.showwarning("No Data", "No attendance records in the selected range.")
+            return
+        
+        late = self.reports.late(
+            start, end,
+            self.settings['working_hours'],
+            self.settings['late_threshold']
+        )
+        if len(late):
+            filename = self._write_report(
+                late,
+                f"late_report_{start}_{end}",
+                title=f"Late Arrivals Report - {start} to {end}",
+                group_by='date'
+            )
+            if filename:
+                messagebox.showinfo("Success", f"Late arrivals report saved to {filename}")
         else:
-            messagebox.showwarning("No Data", "No attendance records for today.")
+            messagebox.showinfo("No Late Arrivals", "No late arrivals in the selected range!")
+
+    def generate_absence_report(self):
+        if self._attendance_loading():
+            return
+        try:
+            start, end = self._report_range()
+        except ValueError:
+            messagebox.showwarning("Invalid Range", "Dates must be in YYYY-MM-DD format.")
+            return
+        
+        absences = self.reports.absences(start, end, self._report_roster())
+        if len(absences):
+            filename = self._write_report(
+                absences,
+                f"absence_report_{start}_{end}",
+                title=f"Absence Report - {start} to {end}",
+                group_by='date'
+            )
+            if filename:
+                messagebox.showinfo("Success", f"Absence report saved to {filename}")
+        else:
+            messagebox.showinfo("No Absences", "Everyone was present in the selected range!")
 
     def export_attendance_data(self):
-        data = self._load_attendance_data()
-        if data:
-            df = pd.DataFrame.from_dict(data, orient='index')
-            df.to_csv("attendance_export.csv")
-            messagebox.showinfo("Success", "Data exported to attendance_export.csv")
+        if self._attendance_loading():
+            return
+        records = self.reports.records(None, None)
+        if len(records):
+            filename = self._write_report(records, "attendance_export")
+            if filename:
+                messagebox.showinfo("Success", f"Data exported to {filename}")
         else:
             messagebox.showwarning("No Data", "No attendance records to export.")
 
-    def _save_report(self, content, filename):
-        with open(filename, 'w') as f:
-            f.write(content)
-   
-    
     def update_camera(self):
         if self.camera_active:
-            ret, frame = self.camera.read()
-            if ret:
-                # Draw guide overlay
-                h, w = frame.shape[:2]
-                center_x, center_y = w//2, h//2
-                size = min(w, h) // 2
-                width = int(size * 0.5)  # Experiment with this ratio for best results
-                height = int(size * 0.8)
-
-                cv2.ellipse(frame, (center_x, center_y), (width, height), 0, 0, 360, (78, 99, 235), 2)
-                
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                frame = cv2.resize(frame, (640, 480))  # Smaller camera preview
-                image = Image.fromarray(frame)
-                photo = ImageTk.PhotoImage(image=image)
-                self.camera_label.config(image=photo)
-                self.camera_label.image = photo
-            self.after(10, self.update_camera)
+            # Only the newest prepared frame is shown; capture and conversion run on the worker
+            image = self.capture.buffer.latest()
+            if image is not None and self.current_page == "home":
+                photo = self.preview_photo
+                if photo is None or (photo.width(), photo.height()) != image.size:
+                    photo = self.preview_photo = ImageTk.PhotoImage(image=image)
+                else:
+                    photo.paste(image)
+                # The home page rebuilds its label, so re-attach the image when it changes
+                if getattr(self.camera_label, 'image', None) is not photo:
+                    self.camera_label.config(image=photo)
+                    self.camera_label.image = photo
+                self.display_fps.tick()
+            self._update_camera_stats()
+            # Poll about twice per captured frame, and rarely while the preview is hidden
+            rate = self.capture.fps.rate
+            delay = int(500 / rate) if rate else 15
+            if self.current_page != "home":
+                delay = 200
+            self.after(min(max(delay, 5), 200), self.update_camera)
+
+    def _update_camera_stats(self):
+        now = time.perf_counter()
+        if now - self.last_stats_update < 0.5 or self.current_page != "home":
+            return
+        self.last_stats_update = now
+        parts = []
+        for capture in self.captures:
+            latency = capture.latency.mean
+            text = f"{capture.label}: {capture.fps.rate:.1f} fps"
+            if latency is not None:
+                text += f", {latency * 1000:.0f} ms"
+            # A video file fails one read at the end of every loop, so only cameras count
+            if capture.read_failures and not capture.is_file:
+                text += f", {capture.read_failures} failed reads"
+            if capture is self.capture:
+                text = f"[{text}]"
+            parts.append(text)
+        text = " · ".join(parts) + f" · Display {self.display_fps.rate:.1f} fps"
+        text += f" · Dropped {self.capture.buffer.dropped}"
+        batcher = self.verification_service and self.verification_service.batcher
+        if batcher and batcher.batches:
+            faces_per_second, mean_batch = batcher.throughput()
+            text += f" · Embedding {faces_per_second:.1f} faces/s (batch {mean_batch:.1f})"
+        if self.recognizers:
+            requested = sum(recognizer.embeddings_requested for recognizer in self.recognizers)
+            text += f" · Hands-free embeddings {requested}"
+        cache = self.verification_service and self.verification_service.cache
+        if cache and cache.hits + cache.misses:
+            text += f" · Repeat cache {cache.hits} hits / {cache.misses} misses"
+        self.camera_stats_label.config(text=text)
+
+    def _open_cameras(self):
+        failed = []
+        for device in self.settings['camera_device']:
+            capture = CaptureWorker(device, preview_size=self.settings['preview_resolution'])
+            if capture.is_opened():
+                capture.start()
+                self.captures.append(capture)
+            else:
+                capture.camera.release()
+                failed.append(str(device))
+        return failed
+
+    def _restart_cameras(self):
+        # Reopen the device list in place; the preview loop keeps running if anything opens
+        self._stop_camera()
+        failed = self._open_cameras()
+        if self.captures:
+            self.capture = self.captures[0]
+            self.camera_active = True
+        self.camera_error = f"❌ Could not open camera {', '.join(failed)}" if failed else None
+        if failed:
+            print(self.camera_error, file=sys.stderr)
+        if self.current_page == "home":
+            if not self.camera_active:
+                self._clear_preview("Camera stopped")
+            self.status_label.config(
+                text=self.camera_error or "Camera restarted with the new device list.",
+                fg=self.colors['error'] if failed else self.colors['text']
+            )
+            self._update_camera_controls()
+        elif self.current_page == "settings" and failed:
+            self.settings_error_label.config(text=self.camera_error)
+
+    def _update_camera_controls(self):
+        # Follow what is actually running, which can change while another page is shown
+        if self.current_page != "home":
+            return
+        self.toggle_camera_btn.config(text="Stop Camera" if self.camera_active else "Start Camera")
+        self.handsfree_btn.config(
+            text="Stop Hands-free" if self.recognizers else "Hands-free Mode",
+            state='normal' if self.camera_active else 'disabled'
+        )
+        self.verify_btn.config(
+            state='normal' if self.camera_active and not self.recognizers else 'disabled'
+        )
+        if len(self.captures) > 1:
+            self.switch_camera_btn.pack(side='left', padx=5, before=self.camera_stats_label)
+        else:
+            self.switch_camera_btn.pack_forget()
+        if self.pending_jobs:
+            self.cancel_btn.pack(side='left', padx=5, before=self.camera_stats_label)
+        else:
+            self.cancel_btn.pack_forget()
+
+    def _clear_preview(self, text):
+        self.camera_label.config(image='', text=text)
+        self.camera_label.image = None
+
+    def switch_camera(self):
+        if not self.captures:
+            return
+        position = self.captures.index(self.capture)
+        self.capture = self.captures[(position + 1) % len(self.captures)]
+        self.last_stats_update = 0.0
 
     def toggle_camera(self):
         if not self.camera_active:
-            self.camera = cv2.VideoCapture(0)
+            failed = self._open_cameras()
+            if not self.captures:
+                self.show_failure(
+                    f"Could not open camera {', '.join(failed)}"
+                )
+                return
+            self.capture = self.captures[0]
             self.camera_active = True
-            self.toggle_camera_btn.config(text="Stop Camera")
-            self.verify_btn.config(state='normal')
+            self.camera_error = None
+            self._update_camera_controls()
             self.update_camera()
-            self.status_label.config(
-                text="Camera active. Position your face in the frame and click Verify.",
-                fg=self.colors['text']
-            )
+            text = "Camera active. Position your face in the frame and click Verify."
+            if failed:
+                text += f"\nCould not open: {', '.join(failed)}"
+            self.status_label.config(text=text, fg=self.colors['text'])
         else:
-            self.camera_active = False
-            self.camera.release()
-            self.toggle_camera_btn.config(text="Start Camera")
-            self.verify_btn.config(state='disabled')
-            self.camera_label.config(image='')
-            self.camera_label.config(text="Camera stopped")
+            self._stop_camera()
+            self._update_camera_controls()
+            self._clear_preview("Camera stopped")
+
+    def _stop_camera(self):
+        if self.recognizers:
+            self._stop_handsfree()
+        self.camera_active = False
+        for capture in self.captures:
+            capture.stop()
+        self.captures = []
+        if self.current_page == "home":
+            self.camera_stats_label.config(text="")
+
+    def _get_verification_service(self):
+        # Rebuilt whenever the pool settings change
+        if self._template_config() != self.index_config:
+            self._rebuild_index()
+        config = (
+            self.settings['verification_mode'],
+            self.settings['verification_workers'],
+            self.settings['verification_timeout'],
+            self.settings['batch_size'],
+            self.settings['batch_wait_ms'] / 1000,
+            self.settings['probe_cache_size'],
+            self.settings['probe_cache_ttl'],
+            self.settings['probe_cache_tolerance']
+        ) + self.index_config
+        if self.verification_service is None or self.verification_config != config:
+            if self.verification_service is not None:
+                self.verification_service.shutdown()
+            (mode, workers, timeout, max_batch, max_wait,
+             cache_size, cache_ttl, cache_tolerance, strategy, max_templates) = config
+            cache = None
+            if cache_size > 0:
+                cache = ProbeCache(cache_size, cache_ttl, cache_tolerance)
+            self.verification_service = VerificationService(
+                self.gallery, lambda: self.index, mode=mode, max_workers=workers, timeout=timeout,
+                strategy=strategy, max_templates=max_templates,
+                gate=QualityGate(self.gallery.detector_backend),
+                max_batch=max_batch, max_wait=max_wait, cache=cache
+            )
+            self.verification_config = config
+        return self.verification_service
 
     def verify_face(self):
         if not self.camera_active:
             return
             
-        ret, frame = self.camera.read()
-        if not ret:
+        frame = self.capture.latest_raw()
+        if frame is None:
             return
-            
-        temp_path = "temp.jpg"
-        cv2.imwrite(temp_path, frame)
         
         try:
-            best_match = None
-            min_distance = float('inf')
-            
-            for img_name in os.listdir(self.db_path):
-                if img_name.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    db_img_path = os.path.join(self.db_path, img_name)
-                    result = DeepFace.verify(
-                        img1_path=temp_path,
-                        img2_path=db_img_path,
-                        enforce_detection=True
-                    )
-                    
-                    if result['verified'] and result['distance'] < min_distance:
-                        min_distance = result['distance']
-                        best_match = img_name.split('.')[0]
-            
-            if best_match:
-                self._record_attendance(best_match)
-                self.show_success(best_match)
-            else:
-                self.show_failure()
-                
-        except Exception as e:
+            threshold = self.settings['verification_threshold']
+            job = self._get_verification_service().submit(frame, threshold, self.top_k)
+        except ValueError as e:
             self.show_failure(str(e))
-            
-        finally:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            self.camera_active = False
-            self.camera.release()
-            self.verify_btn.config(state='disabled')
-            self.toggle_camera_btn.pack_forget()
-            self.verify_btn.pack_forget()
-            self.try_again_btn.pack(expand=True)
+            return
+        job.source = self.capture
+        
+        # The camera keeps running so the next person can step up while this one is matched
+        self.pending_jobs.append(job)
+        self._update_camera_controls()
+        self._show_pending()
+        if len(self.pending_jobs) == 1:
+            self.after(100, self._poll_verifications)
+
+    def _poll_verifications(self):
+        for job in list(self.pending_jobs):
+            if job.cancelled:
+                self.pending_jobs.remove(job)
+            elif job.timed_out():
+                job.cancel()
+                self.pending_jobs.remove(job)
+                self._show_result(failure="Verification timed out")
+            elif job.future.done():
+                self.pending_jobs.remove(job)
+                job.source.latency.add(job.latency())
+                try:
+                    matches = job.future.result()
+                except QualityError as e:
+                    self._show_quality_feedback(str(e))
+                    continue
+                except Exception as e:
+                    self._show_result(failure=str(e))
+                    continue
+                if matches:
+                    name = matches[0][0]
+                    self._record_attendance(name)
+                    self._show_result(name=name)
+                else:
+                    self._show_result()
+        
+        if self.pending_jobs:
+            self._show_pending()
+            self.after(100, self._poll_verifications)
+        else:
+            self._update_camera_controls()
+
+    def _show_pending(self):
+        if self.current_page != "home":
+            return
+        elapsed = time.monotonic() - self.pending_jobs[0].submitted_at
+        text = f"⏳ Verifying identity... {elapsed:.0f}s"
+        if len(self.pending_jobs) > 1:
+            text += f" ({len(self.pending_jobs)} in queue)"
+        self.status_label.config(text=text, fg=self.colors['warning'])
+
+    def _show_result(self, name=None, failure=""):
+        if self.current_page != "home":
+            return
+        if name:
+            self.show_success(name)
+        else:
+            self.show_failure(failure)
+
+    def _show_quality_feedback(self, message):
+        if self.current_page == "home":
+            self.status_label.config(text=f"⚠ {message}", fg=self.colors['warning'])
+
+    def cancel_verification(self):
+        for job in self.pending_jobs:
+            job.cancel()
+        self.status_label.config(text="Verification cancelled", fg=self.colors['subtext'])
+
+    def toggle_handsfree(self):
+        if not self.recognizers:
+            self._start_handsfree()
+            self._update_camera_controls()
+            self.status_label.config(
+                text="Hands-free mode active. Walk up to the camera to check in.",
+                fg=self.colors['text']
+            )
+            self.after(200, self._poll_handsfree)
+        else:
+            self._stop_handsfree()
+            self.status_label.config(
+                text="Hands-free mode stopped.",
+                fg=self.colors['subtext']
+            )
+
+    def _start_handsfree(self):
+        # Every camera feeds the same verification service, so the model and
+        # gallery are loaded once however many entrances are watched
+        service = self._get_verification_service()
+        threshold = self.settings['verification_threshold']
+        for capture in self.captures:
+            recognizer = HandsFreeRecognizer(
+                capture,
+                lambda crop: service.submit(crop, threshold, self.top_k, use_guide=False),
+                cooldown=self.settings['handsfree_cooldown'],
+                recheck_interval=self.settings['handsfree_recheck'],
+                detect_every=self.settings['frame_skip'],
+                events=self.handsfree_events,
+                last_recorded=self.handsfree_seen,
+                record_lock=self.handsfree_lock
+            )
+            recognizer.start()
+            self.recognizers.append(recognizer)
+
+    def _stop_handsfree(self):
+        for recognizer in self.recognizers:
+            recognizer.stop()
+        self.recognizers = []
+        self._update_camera_controls()
+
+    def _poll_handsfree(self):
+        if not self.recognizers:
+            return
+        try:
+            while True:
+                name = self.handsfree_events.get_nowait()
+                # Walking past a camera later in the day is not a new arrival. Until the
+                # history is indexed, record anyway: the index keeps the earliest time
+                today = datetime.now().strftime("%Y-%m-%d")
+                if not (self.attendance.loaded.is_set() and self.attendance.checked_in(today, name)):
+                    self._record_attendance(name)
+                self._show_result(name=name)
+        except queue.Empty:
+            pass
+        self.after(200, self._poll_handsfree)
 
     def show_success(self, name):
         self.status_label.config(
@@ -537,34 +1379,23 @@ class ModernAttendanceSystem(tk.Tk):
         message = "❌ No matching face found" if not error_msg else f"❌ Error: {error_msg}"
         self.status_label.config(text=message, fg=self.colors['error'])
 
-    def reset_system(self):
-        self.camera_label.config(text="Camera not started", image='')
-        self.try_again_btn.pack_forget()
-        self.toggle_camera_btn.pack(side='left', padx=5)
-        self.verify_btn.pack(side='left', padx=5)
-        self.status_label.config(
-            text="Welcome! Start the camera to begin verification.",
-            fg=self.colors['text']
-        )
-
     def _record_attendance(self, name):
-        date = datetime.now().strftime("%Y-%m-%d")
-        time = datetime.now().strftime("%H:%M:%S")
-        
-        attendance_file = "attendance.json"
-        attendance_data = {}
-        
-        if os.path.exists(attendance_file):
-            with open(attendance_file, 'r') as f:
-                attendance_data = json.load(f)
-        
-        if date not in attendance_data:
-            attendance_data[date] = {}
-            
-        attendance_data[date][name] = time
-        
-        with open(attendance_file, 'w') as f:
-            json.dump(attendance_data, f, indent=4)
+        now = datetime.now()
+        with span("attendance_write"):
+            self.attendance.record(now.strftime("%Y-%m-%d"), name, now.strftime("%H:%M:%S"))
+
+    def _on_close(self):
+        if self.camera_active:
+            self._stop_camera()
+        for job in self.pending_jobs:
+            job.cancel()
+        if self.verification_service is not None:
+            self.verification_service.shutdown()
+        self.gallery_watcher.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        self.attendance.close()
+        self.destroy()
 
 if __name__ == "__main__":
     app = ModernAttendanceSystem()
@@ -0,0 +1,86 @@
+import math
+import cv2
+import numpy as np
+from capture import guide_ellipse
+from metrics import span
+
+
+class QualityError(ValueError):
+    pass
+
+
+def guide_region(frame, margin=0.15):
+    # Bounding box of the on-screen guide ellipse, slightly padded
+    h, w = frame.shape[:2]
+    (cx, cy), (ax, ay) = guide_ellipse(w, h)
+    ax, ay = int(ax * (1 + margin)), int(ay * (1 + margin))
+    x0, y0 = max(0, cx - ax), max(0, cy - ay)
+    x1, y1 = min(w, cx + ax), min(h, cy + ay)
+    return frame[y0:y1, x0:x1]
+
+
+class QualityGate:
+    def __init__(self, detector_backend="opencv", min_face_size=80, min_sharpness=60.0,
+                 max_roll=20.0, max_yaw=0.25):
+        self.detector_backend = detector_backend
+        self.min_face_size = min_face_size
+        self.min_sharpness = min_sharpness
+        self.max_roll = max_roll
+        self.max_yaw = max_yaw
+
+    def detect(self, img):
+        from deepface import DeepFace
+        faces = DeepFace.extract_faces(
+            img_path=img,
+            detector_backend=self.detector_backend,
+            align=True,
+            enforce_detection=False
+        )
+        # With enforce_detection off, "no face" comes back as the whole image at zero confidence
+        faces = [f for f in faces if f.get('confidence', 0) > 0]
+        if not faces:
+            return None
+        return max(faces, key=lambda f: f['facial_area']['w'] * f['facial_area']['h'])
+
+    def score(self, img, face):
+        area = face['facial_area']
+        x, y, w, h = area['x'], area['y'], area['w'], area['h']
+        gray = cv2.cvtColor(img[y:y + h, x:x + w], cv2.COLOR_BGR2GRAY)
+        scores = {
+            'size': min(w, h),
+            'sharpness': float(cv2.Laplacian(gray, cv2.CV_64F).var()) if gray.size else 0.0,
+            'roll': 0.0,
+            'yaw': 0.0
+        }
+        left, right = area.get('left_eye'), area.get('right_eye')
+        if left and right:
+            dx, dy = right[0] - left[0], right[1] - left[1]
+            scores['roll'] = abs(math.degrees(math.atan2(dy, dx)))
+            if scores['roll'] > 90:
+                scores['roll'] = 180 - scores['roll']
+            # Eyes drift off the box centre as the head turns
+            eyes_center = (left[0] + right[0]) / 2
+            scores['yaw'] = abs(eyes_center - (x + w / 2)) / w
+        return scores
+
+    def check(self, img, use_guide=True):
+        # Returns the aligned BGR face crop, or raises QualityError saying what to fix
+        if use_guide:
+            img = guide_region(img)
+        with span("detection"):
+            face = self.detect(img)
+        if face is None:
+            raise QualityError("No face found. Position your face inside the oval.")
+
+        scores = self.score(img, face)
+        if scores['size'] < self.min_face_size:
+            raise QualityError("Face too small. Please move closer to the camera.")
+        if scores['sharpness'] < self.min_sharpness:
+            raise QualityError("Image too blurry. Please hold still.")
+        if scores['roll'] > self.max_roll or scores['yaw'] > self.max_yaw:
+            raise QualityError("Please face the camera directly.")
+
+        aligned = face['face']
+        if aligned.dtype != np.uint8:
+            aligned = (aligned * 255).clip(0, 255).astype(np.uint8)
+        return cv2.cvtColor(aligned, cv2.COLOR_RGB2BGR), scores
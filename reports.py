@@ -0,0 +1,188 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+REPORT_FORMATS = ('txt', 'csv', 'parquet')
+
+
+def parse_clock(values):
+    # Zero-padded "HH:MM[:SS]" strings (as the store writes them) -> minutes since
+    # midnight, without a per-row strptime
+    raw = np.asarray(values, dtype='S8').view(np.uint8).reshape(-1, 8).astype(np.int32) - ord('0')
+    minutes = raw[:, 0] * 600 + raw[:, 1] * 60 + raw[:, 3] * 10 + raw[:, 4]
+    seconds = np.where(raw[:, 6] >= 0, raw[:, 6] * 10 + raw[:, 7], 0)
+    return minutes + seconds / 60.0
+
+
+def work_start_minutes(working_hours):
+    # A single typed value, so strptime: it also accepts "9:00" without the leading zero
+    start = datetime.strptime(working_hours.split('-')[0].strip(), "%H:%M")
+    return float(start.hour * 60 + start.minute)
+
+
+class ReportEngine:
+    def __init__(self, store):
+        self.store = store
+        self._frame = None
+        self._version = -1
+
+    def frame(self):
+        # Columnar view of the whole history. Built once, then new check-ins are
+        # appended; a full rebuild only happens when the store cannot say what changed
+        with self.store.lock:
+            self.store.refresh()
+            if self._version == self.store.version:
+                return self._frame
+            version = self.store.version
+            changes = self.store.changes_since(self._version) if self._frame is not None else None
+            if changes is None or any(replaced for *_, replaced in changes):
+                rows = None
+                dates, names, times = [], [], []
+                for date, records in self.store.by_date.items():
+                    dates.extend([date] * len(records))
+                    names.extend(records)
+                    times.extend(records.values())
+            else:
+                rows = [(date, name, time) for _, date, name, time, _ in changes]
+
+        if rows is None:
+            self._frame = _sorted(_columns(dates, names, times)).reset_index(drop=True)
+        else:
+            self._frame = _append(self._frame, rows)
+        self._version = version
+        return self._frame
+
+    def between(self, start=None, end=None):
+        frame = self.frame()
+        mask = np.ones(len(frame), dtype=bool)
+        if start is not None:
+            mask &= (frame['date'] >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (frame['date'] <= pd.Timestamp(end)).to_numpy()
+        return frame[mask]
+
+    def records(self, start, end):
+        return self.between(start, end)[['date', 'name', 'time']]
+
+    def late(self, start, end, working_hours, late_threshold):
+        frame = self.between(start, end)
+        cutoff = work_start_minutes(working_hours) + float(late_threshold)
+        late = frame[frame['minutes'].to_numpy() > cutoff]
+        return late.assign(minutes_late=np.round(late['minutes'] - cutoff, 1))[
+            ['date', 'name', 'time', 'minutes_late']
+        ]
+
+    def summary(self, start, end, working_hours, late_threshold, roster=None):
+        frame = self.between(start, end)
+        cutoff = work_start_minutes(working_hours) + float(late_threshold)
+        frame = frame.assign(late=frame['minutes'].to_numpy() > cutoff)
+        per_person = frame.groupby('name', observed=True).agg(
+            days_present=('date', 'nunique'),
+            late_days=('late', 'sum'),
+            mean_arrival_minutes=('minutes', 'mean')
+        )
+
+        workdays = len(pd.bdate_range(start, end))
+        if roster is not None:
+            per_person = per_person.reindex(
+                per_person.index.astype(object).union(pd.Index(sorted(roster), dtype=object))
+            )
+            per_person[['days_present', 'late_days']] = (
+                per_person[['days_present', 'late_days']].fillna(0).astype(int)
+            )
+        per_person['days_absent'] = np.maximum(workdays - per_person['days_present'], 0)
+        per_person['mean_arrival'] = _format_clock(per_person['mean_arrival_minutes'])
+        return per_person.drop(columns='mean_arrival_minutes').reset_index().rename(
+            columns={'index': 'name'}
+        )
+
+    def absences(self, start, end, roster):
+        # Every roster member x business day, minus the (name, day) pairs seen in the log
+        frame = self.between(start, end)
+        days = pd.bdate_range(start, end)
+        expected = pd.MultiIndex.from_product(
+            [days, pd.Index(sorted(roster), dtype=object)], names=['date', 'name']
+        )
+        present = pd.MultiIndex.from_arrays(
+            [frame['date'], frame['name'].astype(object)], names=['date', 'name']
+        )
+        return expected[~expected.isin(present)].to_frame(index=False)
+
+
+def _columns(dates, names, times, categories=None):
+    return pd.DataFrame({
+        'date': pd.to_datetime(pd.Series(dates, dtype=object), format="%Y-%m-%d"),
+        'name': pd.Categorical(names, categories=categories),
+        'time': pd.Series(times, dtype=object),
+        'minutes': parse_clock(times) if len(times) else np.empty(0)
+    })
+
+
+def _sorted(frame):
+    return frame.sort_values(['date', 'minutes'], kind='stable')
+
+
+def _append(frame, rows):
+    # New check-ins are (almost always) today's, so only the rows from their first
+    # date onwards are re-sorted; the rest of the frame is copied as is
+    dates, names, times = zip(*rows)
+    categories = frame['name'].cat.categories
+    unseen = pd.Index(sorted(set(names)), dtype=object).difference(categories)
+    if len(unseen):
+        frame = frame.assign(name=frame['name'].cat.add_categories(unseen))
+        categories = frame['name'].cat.categories
+    new = _columns(dates, names, times, categories)
+    start = int(frame['date'].searchsorted(new['date'].min()))
+    tail = _sorted(pd.concat([frame.iloc[start:], new], ignore_index=True))
+    return pd.concat([frame.iloc[:start], tail], ignore_index=True)
+
+
+def _format_clock(minutes):
+    minutes = minutes.to_numpy(dtype=float)
+    missing = np.isnan(minutes)
+    minutes = np.where(missing, 0, minutes)
+    hours = (minutes // 60).astype(int)
+    mins = (minutes % 60).astype(int)
+    return [
+        "-" if absent else f"{h:02d}:{m:02d}"
+        for h, m, absent in zip(hours, mins, missing)
+    ]
+
+
+def write_report(frame, path, title=None, group_by=None):
+    # Streams rows to disk instead of building the whole report in memory
+    fmt = path.rsplit('.', 1)[-1].lower()
+    if fmt == 'csv':
+        frame.to_csv(path, index=False, date_format="%Y-%m-%d")
+    elif fmt == 'parquet':
+        frame.to_parquet(path, index=False)
+    elif fmt == 'txt':
+        with open(path, 'w') as f:
+            if title:
+                f.write(f"{title}\n")
+            if group_by is None:
+                f.write("\n")
+                _write_rows(f, frame)
+            else:
+                for key, group in frame.groupby(group_by, sort=True):
+                    if hasattr(key, 'strftime'):
+                        key = key.strftime("%Y-%m-%d")
+                    f.write(f"\n{group_by.title()}: {key}\n")
+                    _write_rows(f, group.drop(columns=group_by))
+    else:
+        raise ValueError(f"Unsupported report format: {fmt}")
+
+
+def _write_rows(f, frame, chunk_size=10000):
+    columns = [c for c in frame.columns if c != 'name']
+    for start in range(0, len(frame), chunk_size):
+        chunk = frame.iloc[start:start + chunk_size]
+        values = [
+            chunk[c].dt.strftime("%Y-%m-%d") if c == 'date' else chunk[c].astype(str)
+            for c in columns
+        ]
+        lines = [
+            f"{name}: {', '.join(parts)}\n" if parts else f"{name}\n"
+            for name, *parts in zip(chunk['name'].astype(str), *values)
+        ]
+        f.writelines(lines)
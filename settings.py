@@ -0,0 +1,209 @@
+import json
+import os
+import threading
+from datetime import datetime
+from capture import parse_devices
+
+SETTINGS_FILE = "settings.json"
+
+RECOGNITION_MODELS = (
+    "VGG-Face", "Facenet", "Facenet512", "OpenFace", "DeepFace", "DeepID",
+    "ArcFace", "Dlib", "SFace", "GhostFaceNet"
+)
+DETECTOR_BACKENDS = (
+    "opencv", "ssd", "dlib", "mtcnn", "retinaface", "mediapipe", "yolov8", "yunet", "centerface"
+)
+
+
+def _working_hours(text):
+    try:
+        start, end = (part.strip() for part in text.split('-'))
+        opens, closes = datetime.strptime(start, "%H:%M"), datetime.strptime(end, "%H:%M")
+    except ValueError:
+        raise ValueError("Use HH:MM-HH:MM, e.g. 09:00-17:00") from None
+    if opens >= closes:
+        raise ValueError("Working hours must end after they start")
+    return f"{opens.strftime('%H:%M')}-{closes.strftime('%H:%M')}"
+
+
+def _resolution(text):
+    try:
+        width, height = (int(part) for part in text.lower().split('x'))
+    except ValueError:
+        raise ValueError("Use WIDTHxHEIGHT, e.g. 640x480") from None
+    if width < 16 or height < 16:
+        raise ValueError("Resolution must be at least 16x16")
+    return width, height
+
+
+def _devices(text):
+    devices = parse_devices(text)
+    if not devices:
+        raise ValueError("At least one camera device is required")
+    return devices
+
+
+def _text(text):
+    return text
+
+
+def _number(kind, minimum=None, maximum=None):
+    def parse(text):
+        try:
+            value = kind(text)
+        except ValueError:
+            message = "Must be a whole number" if kind is int else "Must be a number"
+            raise ValueError(message) from None
+        if minimum is not None and value < minimum:
+            raise ValueError(f"Must be at least {minimum}")
+        if maximum is not None and value > maximum:
+            raise ValueError(f"Must be at most {maximum}")
+        return value
+    return parse
+
+
+def _threshold(text):
+    # "auto" follows the recognition model, so switching models never keeps a stale cutoff
+    if text.lower() == "auto":
+        return None
+    try:
+        float(text)
+    except ValueError:
+        raise ValueError('Must be a number or "auto"') from None
+    return _number(float, 0.0, 2.0)(text)
+
+
+def _choice(*choices):
+    def parse(text):
+        if text not in choices:
+            raise ValueError(f"Must be one of: {', '.join(choices)}")
+        return text
+    return parse
+
+
+# key, label, parser, default (as typed into the Settings page)
+SETTINGS = [
+    ('working_hours', "Working Hours", _working_hours, "09:00-17:00"),
+    ('late_threshold', "Late Threshold (minutes)", _number(float, 0), "15"),
+    ('camera_device', "Camera Device", _devices, "0"),
+    ('preview_resolution', "Preview Resolution", _resolution, "640x480"),
+    ('model_name', "Recognition Model", _choice(*RECOGNITION_MODELS), "VGG-Face"),
+    ('detector_backend', "Face Detector", _choice(*DETECTOR_BACKENDS), "opencv"),
+    ('verification_threshold', "Verification Threshold (auto = model default)", _threshold, "auto"),
+    ('verification_mode', "Verification Mode (thread/process)", _choice("thread", "process"), "thread"),
+    ('verification_workers', "Verification Workers", _number(int, 1, 64), "2"),
+    ('verification_timeout', "Verification Timeout (seconds)", _number(float, 1), "30"),
+    ('batch_size', "Embedding Batch Size", _number(int, 1, 256), "8"),
+    ('batch_wait_ms', "Embedding Batch Wait (ms)", _number(float, 0, 1000), "20"),
+    ('probe_cache_size', "Repeat Scan Cache Size", _number(int, 0), "64"),
+    ('probe_cache_ttl', "Repeat Scan Cache TTL (seconds)", _number(float, 0), "10"),
+    ('probe_cache_tolerance', "Repeat Scan Tolerance", _number(float, 0.0, 1.0), "0.05"),
+    ('template_strategy', "Template Matching (mean/best)", _choice("mean", "best"), "mean"),
+    ('max_templates', "Max Templates per Person (0 = all)", _number(int, 0), "10"),
+    ('frame_skip', "Hands-free Detect Every N Frames", _number(int, 1, 30), "3"),
+    ('handsfree_cooldown', "Hands-free Cooldown (seconds)", _number(float, 0), "300"),
+    ('handsfree_recheck', "Hands-free Re-check Interval (seconds)", _number(float, 0.1), "2"),
+    ('attendance_backend', "Attendance Storage (jsonl/sqlite)", _choice("jsonl", "sqlite"), "jsonl"),
+    ('metrics_file', "Metrics File (blank = off)", _text, "metrics.prom"),
+    ('metrics_port', "Metrics HTTP Port (0 = off)", _number(int, 0, 65535), "0"),
+]
+
+
+class SettingsStore:
+    # Typed settings backed by a JSON file. Values are validated on the way in, so
+    # everything read back is already the right type; edits made to the file by
+    # hand are picked up by reload_if_changed()
+    def __init__(self, path=SETTINGS_FILE, schema=SETTINGS):
+        self.path = path
+        self.schema = {key: (label, parse) for key, label, parse, _ in schema}
+        self.raw = {key: default for key, _, _, default in schema}
+        self.values = {key: parse(default) for key, _, parse, default in schema}
+        self.errors = {}
+        self.lock = threading.RLock()
+        self._stat = None
+        self._listeners = []
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def label(self, key):
+        return self.schema[key][0]
+
+    def subscribe(self, callback):
+        # callback(changed_keys) runs on whichever thread changed the settings
+        self._listeners.append(callback)
+
+    def load(self):
+        with self.lock:
+            try:
+                with open(self.path, 'r') as f:
+                    saved = json.load(f)
+                self._stat = self._file_stat()
+            except FileNotFoundError:
+                return []
+            except ValueError as e:
+                # A half-written hand edit: keep the current values and try again later
+                self.errors['file'] = str(e)
+                self._stat = self._file_stat()
+                return []
+            self.errors.pop('file', None)
+            changed = []
+            for key, text in saved.items():
+                if key not in self.schema:
+                    continue
+                text = str(text)
+                try:
+                    value = self.schema[key][1](text)
+                except ValueError as e:
+                    self.errors[key] = str(e)
+                    continue
+                self.errors.pop(key, None)
+                self.raw[key] = text
+                if value != self.values[key]:
+                    self.values[key] = value
+                    changed.append(key)
+            return changed
+
+    def parse(self, key, text):
+        # Validates without applying; raises ValueError with a message for the user
+        return self.schema[key][1](text.strip())
+
+    def set(self, key, text):
+        # Raises ValueError (and keeps the old value) if the text does not parse
+        value = self.parse(key, text)
+        with self.lock:
+            self.raw[key] = text.strip()
+            self.errors.pop(key, None)
+            changed = value != self.values[key]
+            self.values[key] = value
+            self.save()
+        if changed:
+            self._notify([key])
+
+    def save(self):
+        with self.lock:
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self.raw, f, indent=4)
+            os.replace(temp_path, self.path)
+            self._stat = self._file_stat()
+
+    def reload_if_changed(self):
+        with self.lock:
+            if self._file_stat() == self._stat:
+                return []
+            changed = self.load()
+        if changed:
+            self._notify(changed)
+        return changed
+
+    def _file_stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _notify(self, changed):
+        for callback in self._listeners:
+            callback(changed)
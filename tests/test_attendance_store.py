@@ -0,0 +1,170 @@
+import json
+import os
+import pytest
+from attendance_store import JsonLinesAttendanceStore, SQLiteAttendanceStore, open_attendance_store
+
+BACKENDS = [
+    (JsonLinesAttendanceStore, "attendance.jsonl"),
+    (SQLiteAttendanceStore, "attendance.db"),
+]
+
+
+@pytest.fixture(params=BACKENDS, ids=["jsonl", "sqlite"])
+def open_store(request, tmp_path):
+    store_class, file_name = request.param
+    stores = []
+
+    def open_store():
+        stores.append(store_class(str(tmp_path / file_name)))
+        return stores[-1]
+
+    yield open_store
+    for store in stores:
+        store.close()
+
+
+def test_records_survive_reopening(open_store):
+    store = open_store()
+    assert store.is_empty()
+    store.record("2024-01-01", "alice", "09:00:00")
+    store.record_many([("2024-01-01", "bob", "09:05:00"), ("2024-01-02", "alice", "08:50:00")])
+    store.close()
+
+    reopened = open_store()
+    assert not reopened.is_empty()
+    assert not reopened.loaded.is_set()
+    per_day, per_person = reopened.summary()
+    assert reopened.loaded.is_set()
+    assert per_day == {"2024-01-01": 2, "2024-01-02": 1}
+    assert per_person == {"alice": 2, "bob": 1}
+    assert reopened.by_date["2024-01-01"] == {"alice": "09:00:00", "bob": "09:05:00"}
+    assert reopened.by_name["alice"] == {"2024-01-01": "09:00:00", "2024-01-02": "08:50:00"}
+
+
+def test_first_check_in_of_the_day_is_kept(open_store):
+    store = open_store()
+    store.record("2024-01-01", "alice", "08:55:00")
+    store.record("2024-01-01", "alice", "12:00:00")
+    assert store.checked_in("2024-01-01", "alice")
+    assert not store.checked_in("2024-01-02", "alice")
+    assert store.by_date["2024-01-01"] == {"alice": "08:55:00"}
+    assert store.by_name["alice"] == {"2024-01-01": "08:55:00"}
+    assert store.record_count == 1
+
+
+def test_changes_since(open_store):
+    store = open_store()
+    store.record("2024-01-01", "alice", "09:00:00")
+    with store.lock:
+        store.refresh()
+        version = store.version
+        assert store.changes_since(version) == []
+    store.record("2024-01-01", "bob", "09:10:00")
+    store.record("2024-01-01", "bob", "09:30:00")
+    with store.lock:
+        store.refresh()
+        assert [change[1:] for change in store.changes_since(version)] == [
+            ("2024-01-01", "bob", "09:10:00", False)
+        ]
+        store.changes.clear()
+        assert store.changes_since(version) is None
+
+
+def test_background_load(open_store):
+    store = open_store()
+    store.record_many([("2024-01-01", f"person_{i}", "09:00:00") for i in range(1000)])
+    store.close()
+
+    reopened = open_store()
+    reopened.load_in_background()
+    assert reopened.loaded.wait(10)
+    assert reopened.record_count == 1000
+
+
+def test_jsonl_reads_in_chunks(tmp_path):
+    store = JsonLinesAttendanceStore(str(tmp_path / "attendance.jsonl"), chunk_size=100)
+    store.record_many([("2024-01-01", f"person_{i}", "09:00:00") for i in range(50)])
+    store.record("2024-01-02", "alice", "09:00:00")
+    with open(store.path, 'a') as f:
+        f.write("not json\n")
+    store.record("2024-01-02", "bob", "09:00:00")
+    assert store.summary()[0] == {"2024-01-01": 50, "2024-01-02": 2}
+
+
+def test_sqlite_reads_in_chunks(tmp_path):
+    store = SQLiteAttendanceStore(str(tmp_path / "attendance.db"), chunk_size=7)
+    store.record_many([("2024-01-01", f"person_{i}", "09:00:00") for i in range(50)])
+    assert store.summary()[0] == {"2024-01-01": 50}
+    store.close()
+
+
+def test_jsonl_fences_off_a_half_written_line(tmp_path):
+    path = tmp_path / "attendance.jsonl"
+    path.write_bytes(
+        b'{"date": "2024-01-01", "name": "alice", "time": "09:00:00"}\n{"date": "2024-01-01", "na'
+    )
+    store = JsonLinesAttendanceStore(str(path))
+    assert store.summary()[1] == {"alice": 1}
+    store.record("2024-01-01", "bob", "09:05:00")
+    assert JsonLinesAttendanceStore(str(path)).summary()[1] == {"alice": 1, "bob": 1}
+
+
+def test_records_from_another_writer_are_picked_up(open_store):
+    store = open_store()
+    store.record("2024-01-01", "alice", "09:00:00")
+    other = open_store()
+    other.record("2024-01-01", "bob", "09:05:00")
+    assert store.summary() == ({"2024-01-01": 2}, {"alice": 1, "bob": 1})
+
+
+def test_statistics(open_store):
+    store = open_store()
+    store.record_many([
+        ("2024-01-02", "alice", "09:00:00"),
+        ("2024-01-01", "alice", "09:00:00"),
+        ("2024-01-01", "bob", "09:00:00"),
+    ])
+    stats = store.statistics("2024-01-02", days=1, top=1)
+    assert stats['today'] == 1
+    assert stats['total'] == 3
+    assert stats['days'] == 2
+    assert stats['people'] == 2
+    assert stats['trend'] == [("2024-01-02", 1)]
+    assert stats['top'] == [("alice", 2)]
+    assert store.statistics("2024-01-02", days=1, top=1) is stats
+    assert store.sorted_dates == ["2024-01-01", "2024-01-02"]
+
+
+def test_legacy_json_is_imported_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("attendance.json", 'w') as f:
+        json.dump({"2024-01-01": {"alice": "09:00:00", "bob": "09:10:00"}}, f)
+
+    store = open_attendance_store("jsonl")
+    assert store.summary()[1] == {"alice": 1, "bob": 1}
+    assert not os.path.exists("attendance.json")
+    assert os.path.exists("attendance.json.migrated")
+    store.close()
+
+
+def test_switching_backend_moves_the_history(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = open_attendance_store("jsonl")
+    store.record("2024-01-01", "alice", "09:00:00")
+    store.close()
+
+    store = open_attendance_store("sqlite")
+    assert store.summary()[1] == {"alice": 1}
+    assert os.path.exists("attendance.jsonl.migrated")
+    store.record("2024-01-02", "bob", "09:00:00")
+    store.close()
+
+    store = open_attendance_store("jsonl")
+    assert store.summary()[1] == {"alice": 1, "bob": 1}
+    assert os.path.exists("attendance.db.migrated")
+    store.close()
+
+
+def test_unknown_backend(tmp_path):
+    with pytest.raises(ValueError):
+        open_attendance_store("csv", str(tmp_path / "attendance.csv"))
@@ -0,0 +1,11 @@
+import pytest
+from enroll import gallery_source
+
+
+def test_only_the_apps_gallery_directory_is_enrolled(tmp_path):
+    (tmp_path / "db").mkdir()
+    (tmp_path / "staff").mkdir()
+    assert gallery_source(None, str(tmp_path)) == str(tmp_path / "db")
+    assert gallery_source(str(tmp_path / "db") + "/", str(tmp_path)) == str(tmp_path / "db") + "/"
+    with pytest.raises(ValueError):
+        gallery_source(str(tmp_path / "staff"), str(tmp_path))
@@ -0,0 +1,368 @@
+import os
+import threading
+import numpy as np
+import pytest
+import gallery as gallery_module
+from gallery import EmbeddingGallery, EnrollmentError, GalleryWatcher, enroll_image, identity_for, select_templates
+
+
+def fake_embedding(path):
+    # Derived from the file contents, so an edited image gets a new embedding
+    with open(path, 'rb') as f:
+        data = f.read()
+    seed = sum(data) % 1000
+    return np.random.default_rng(seed).standard_normal(8).astype(np.float32)
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / "db"
+    path.mkdir()
+    (path / "alice.jpg").write_bytes(b"alice")
+    (path / "bob.png").write_bytes(b"bob")
+    (path / "notes.txt").write_bytes(b"not an image")
+    return path
+
+
+@pytest.fixture
+def embedded(monkeypatch):
+    calls = []
+
+    def embed(img, model_name, detector_backend):
+        calls.append(os.path.basename(img))
+        data = open(img, 'rb').read()
+        if b"no face" in data:
+            raise ValueError("Face could not be detected")
+        if b"group" in data:
+            raise EnrollmentError("2 faces found, expected exactly one")
+        if b"corrupt" in data:
+            raise RuntimeError("cannot decode image")
+        return fake_embedding(img)
+
+    monkeypatch.setattr(gallery_module, 'embed_enrollment_image', embed)
+    return calls
+
+
+def make_gallery(db, tmp_path):
+    return EmbeddingGallery(str(db), cache_dir=str(tmp_path))
+
+
+def names(gallery):
+    return sorted(entry['name'] for entry in gallery.entries.values())
+
+
+def test_sync_embeds_every_image_once(db, tmp_path, embedded):
+    gallery = make_gallery(db, tmp_path)
+    gallery.sync()
+    assert names(gallery) == ["alice", "bob"]
+    assert sorted(embedded) == ["alice.jpg", "bob.png"]
+
+    gallery.sync()
+    assert len(embedded) == 2
+
+
+def test_cache_round_trip(db, tmp_path, embedded):
+    gallery = make_gallery(db, tmp_path)
+    gallery.sync()
+
+    reloaded = make_gallery(db, tmp_path)
+    reloaded.load()
+    assert names(reloaded) == ["alice", "bob"]
+    for path, entry in gallery.entries.items():
+        np.testing.assert_array_equal(reloaded.entries[path]['embedding'], entry['embedding'])
+
+    reloaded.sync()
+    assert len(embedded) == 2
+
+
+def test_changed_and_removed_images(db, tmp_path, embedded):
+    gallery = make_gallery(db, tmp_path)
+    gallery.sync()
+    os.remove(db / "bob.png")
+    (db / "alice.jpg").write_bytes(b"alice, new photo")
+    os.utime(db / "alice.jpg", (1, 1))
+    gallery.sync()
+
+    assert names(gallery) == ["alice"]
+    assert embedded.count("alice.jpg") == 2
+
+
+def test_image_without_a_face_is_left_out(db, tmp_path, embedded):
+    (db / "carol.jpg").write_bytes(b"no face")
+    gallery = make_gallery(db, tmp_path)
+    gallery.sync()
+    assert names(gallery) == ["alice", "bob"]
+
+
+def test_sync_reports_changed_and_removed(db, tmp_path, embedded):
+    gallery = make_gallery(db, tmp_path)
+    changed, removed = gallery.sync()
+    assert sorted(os.path.basename(p) for p in changed) == ["alice.jpg", "bob.png"]
+    assert removed == []
+
+    (db / "dave.jpg").write_bytes(b"dave")
+    os.remove(db / "bob.png")
+    changed, removed = gallery.sync()
+    assert [os.path.basename(p) for p in changed] == ["dave.jpg"]
+    assert [os.path.basename(p) for p in removed] == ["bob.png"]
+    assert gallery.sync() == ([], [])
+
+
+def test_rejected_image_is_not_retried_until_it_changes(db, tmp_path, embedded):
+    (db / "carol.jpg").write_bytes(b"no face")
+    gallery = make_gallery(db, tmp_path)
+    gallery.sync()
+    assert str(db / "carol.jpg") in gallery.rejected
+
+    reloaded = make_gallery(db, tmp_path)
+    reloaded.load()
+    reloaded.sync()
+    assert embedded.count("carol.jpg") == 1
+
+    (db / "carol.jpg").write_bytes(b"carol, with a face")
+    changed, _ = reloaded.sync()
+    assert changed == [str(db / "carol.jpg")]
+    assert str(db / "carol.jpg") not in reloaded.rejected
+
+
+def test_touched_image_keeps_its_embedding(db, tmp_path, embedded):
+    gallery = make_gallery(db, tmp_path)
+    gallery.sync()
+    os.utime(db / "alice.jpg", (1, 1))
+    assert gallery.sync() == ([], [])
+    assert embedded.count("alice.jpg") == 1
+    assert gallery.entries[str(db / "alice.jpg")]['mtime'] == 1
+
+
+def test_identity_comes_from_the_person_folder_or_file_stem():
+    db = os.path.join("db")
+    assert identity_for(db, os.path.join(db, "alice", "front.jpg")) == "alice"
+    assert identity_for(db, os.path.join(db, "alice", "side", "left.jpg")) == "alice"
+    assert identity_for(db, os.path.join(db, "WhatsApp Image at 12.46.53 PM.jpeg")) == "WhatsApp Image at 12.46.53 PM"
+
+
+def test_person_folders_are_scanned_and_hidden_ones_skipped(db, tmp_path, embedded):
+    (db / "erin").mkdir()
+    (db / "erin" / "front.jpg").write_bytes(b"erin front")
+    (db / "erin" / "side.jpg").write_bytes(b"erin side")
+    (db / ".trash").mkdir()
+    (db / ".trash" / "old.jpg").write_bytes(b"old")
+    gallery = make_gallery(db, tmp_path)
+    gallery.sync()
+
+    assert names(gallery) == ["alice", "bob", "erin", "erin"]
+    assert gallery.names() == {"alice", "bob", "erin"}
+
+
+def test_group_photo_is_rejected_with_a_reason(db, tmp_path, embedded):
+    (db / "team.jpg").write_bytes(b"group")
+    path = str(db / "team.jpg")
+    stat = os.stat(path)
+    result = enroll_image(path, stat.st_mtime, stat.st_size, "VGG-Face", "opencv")
+    assert result[4] is None
+    assert "exactly one" in result[5]
+
+    gallery = make_gallery(db, tmp_path)
+    gallery.sync()
+    assert path in gallery.rejected
+    assert "team" not in gallery.names()
+
+
+def test_plan_and_apply_resume_where_they_stopped(db, tmp_path, embedded):
+    gallery = make_gallery(db, tmp_path)
+    pending, touched, removed, stale = gallery.plan()
+    assert [os.path.basename(p) for p, _, _ in pending] == ["alice.jpg", "bob.png"]
+    assert (touched, removed, stale) == ({}, [], [])
+
+    # Only the first image is embedded before the run stops
+    first = enroll_image(*pending[0], "VGG-Face", "opencv")[:5]
+    assert gallery.apply([first]) == ([pending[0][0]], [])
+    gallery.save()
+
+    resumed = make_gallery(db, tmp_path)
+    resumed.load()
+    pending, _, _, _ = resumed.plan()
+    assert [os.path.basename(p) for p, _, _ in pending] == ["bob.png"]
+
+
+def test_select_templates_keeps_the_spread():
+    embeddings = np.array([[1, 0], [0.99, 0.14], [0.98, 0.2], [0, 1], [-1, 0]], dtype=np.float32)
+    assert select_templates(embeddings, 10) == [0, 1, 2, 3, 4]
+    chosen = select_templates(embeddings, 3)
+    assert len(chosen) == 3
+    # The far-off poses are kept over near-duplicates of the central one
+    assert 3 in chosen and 4 in chosen
+
+
+@pytest.fixture
+def group_db(db):
+    (db / "erin").mkdir()
+    for i in range(4):
+        (db / "erin" / f"{i}.jpg").write_bytes(f"erin {i}".encode())
+    return db
+
+
+def test_templates_mean_and_best(group_db, tmp_path, embedded):
+    gallery = make_gallery(group_db, tmp_path)
+    gallery.sync()
+    assert gallery.identities() == {"alice": 1, "bob": 1, "erin": 4}
+
+    labels, vectors = gallery.templates(strategy="mean")
+    assert sorted(labels) == ["alice", "bob", "erin"]
+    assert vectors.shape == (3, 8)
+
+    labels, vectors = gallery.templates(strategy="best", max_templates=2)
+    assert sorted(labels) == ["alice", "bob", "erin", "erin"]
+
+    labels, _ = gallery.templates(names={"erin"}, strategy="best")
+    assert labels == ["erin"] * 4
+    with pytest.raises(ValueError):
+        gallery.templates(strategy="median")
+
+
+def test_prune_drops_surplus_templates_for_good(group_db, tmp_path, embedded):
+    gallery = make_gallery(group_db, tmp_path)
+    gallery.sync()
+    pruned = gallery.prune(2)
+    assert len(pruned) == 2
+    assert gallery.identities()["erin"] == 2
+
+    reloaded = make_gallery(group_db, tmp_path)
+    reloaded.load()
+    assert reloaded.sync() == ([], [])
+    assert reloaded.identities()["erin"] == 2
+
+
+def test_a_failing_image_does_not_lose_the_batch(db, tmp_path, embedded):
+    (db / "broken.jpg").write_bytes(b"corrupt")
+    gallery = make_gallery(db, tmp_path)
+    gallery.sync()
+    assert gallery.names() == {"alice", "bob"}
+
+
+def test_an_image_that_failed_to_embed_is_retried(db, tmp_path, embedded, monkeypatch):
+    embed = gallery_module.embed_enrollment_image
+
+    def out_of_memory(img, model_name, detector_backend):
+        raise RuntimeError("OOM when allocating tensor")
+
+    monkeypatch.setattr(gallery_module, 'embed_enrollment_image', out_of_memory)
+    gallery = make_gallery(db, tmp_path)
+    assert gallery.sync() == ([], [])
+    assert sorted(os.path.basename(p) for p in gallery.failed) == ["alice.jpg", "bob.png"]
+    assert gallery.rejected == {}
+
+    reloaded = make_gallery(db, tmp_path)
+    reloaded.load()
+    assert reloaded.rejected == {}
+
+    monkeypatch.setattr(gallery_module, 'embed_enrollment_image', embed)
+    changed, _ = gallery.sync()
+    assert sorted(os.path.basename(p) for p in changed) == ["alice.jpg", "bob.png"]
+    assert gallery.failed == {}
+
+
+def test_watcher_keeps_polling_after_a_sync_error(db, tmp_path, embedded, monkeypatch):
+    gallery = make_gallery(db, tmp_path)
+    sync = gallery.sync
+    failures = []
+
+    def flaky_sync(snapshot=None):
+        if not failures:
+            failures.append(1)
+            raise RuntimeError("model download failed")
+        return sync(snapshot)
+
+    monkeypatch.setattr(gallery, 'sync', flaky_sync)
+    done = threading.Event()
+    watcher = GalleryWatcher(gallery, lambda changed, removed: done.set(), interval=0.01)
+    watcher.start()
+    try:
+        assert done.wait(5)
+    finally:
+        watcher.stop()
+    assert failures and gallery.names() == {"alice", "bob"}
+
+
+def test_watcher_retries_a_failed_image_without_a_db_change(db, tmp_path, embedded, monkeypatch):
+    embed = gallery_module.embed_enrollment_image
+    failures = []
+
+    def flaky_embed(img, model_name, detector_backend):
+        if not failures:
+            failures.append(img)
+            raise RuntimeError("weights download failed")
+        return embed(img, model_name, detector_backend)
+
+    monkeypatch.setattr(gallery_module, 'embed_enrollment_image', flaky_embed)
+    gallery = make_gallery(db, tmp_path)
+    seen = set()
+    done = threading.Event()
+
+    def on_change(changed, removed):
+        seen.update(changed)
+        if len(seen) == 2:
+            done.set()
+
+    watcher = GalleryWatcher(gallery, on_change, interval=0.01)
+    watcher.start()
+    try:
+        assert done.wait(5)
+    finally:
+        watcher.stop()
+    assert failures[0] in seen
+
+
+def test_cache_from_another_enrollment_root_is_not_reported_removed(db, tmp_path, embedded):
+    staff = tmp_path / "staff"
+    (staff / "frank").mkdir(parents=True)
+    (staff / "frank" / "1.jpg").write_bytes(b"frank")
+    make_gallery(staff, tmp_path).sync()
+
+    gallery = make_gallery(db, tmp_path)
+    gallery.load()
+    assert gallery.entries == {}
+    changed, removed = gallery.sync()
+    assert removed == []
+    assert gallery.names() == {"alice", "bob"}
+
+
+def test_cache_is_shared_by_any_spelling_of_the_root(db, tmp_path, embedded, monkeypatch):
+    make_gallery(db, tmp_path).sync()
+
+    monkeypatch.chdir(tmp_path)
+    reloaded = EmbeddingGallery("db/", cache_dir=".")
+    reloaded.load()
+    assert reloaded.names() == {"alice", "bob"}
+    assert reloaded.sync() == ([], [])
+    assert len(embedded) == 2
+
+
+def test_version_2_cache_keeps_only_its_own_root(db, tmp_path, embedded):
+    gallery = make_gallery(db, tmp_path)
+    gallery.sync()
+    alice = str(db / "alice.jpg")
+    entry = gallery.entries[alice]
+    staff_photo = str(tmp_path / "staff" / "frank" / "1.jpg")
+    # The layout written before the cache recorded its root: paths as scanned
+    np.savez(
+        gallery.cache_path,
+        version=np.array(2),
+        model_name=np.array("VGG-Face"),
+        paths=np.array([alice, staff_photo]),
+        names=np.array(["alice", "frank"]),
+        mtimes=np.array([entry['mtime'], 1.0]),
+        sizes=np.array([entry['size'], 5]),
+        hashes=np.array([entry['hash'], "0"]),
+        embeddings=np.stack([entry['embedding'], entry['embedding']]),
+        rejected_paths=np.array([], dtype=str),
+        rejected_mtimes=np.array([], dtype=np.float64),
+        rejected_sizes=np.array([], dtype=np.int64)
+    )
+
+    reloaded = make_gallery(db, tmp_path)
+    reloaded.load()
+    assert list(reloaded.entries) == [alice]
+    changed, removed = reloaded.sync()
+    assert [os.path.basename(p) for p in changed] == ["bob.png"]
+    assert removed == []
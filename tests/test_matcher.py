@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from matcher import BruteForceIndex, IVFIndex, build_index
+
+
+def gallery(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return [f"person_{i}" for i in range(n)], rng.standard_normal((n, dim)).astype(np.float32)
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean", "euclidean_l2"])
+def test_brute_force_matches_direct_distances(metric):
+    labels, vectors = gallery(100)
+    query = vectors[0] + 0.1
+    index = BruteForceIndex(metric).build(labels, vectors)
+
+    if metric == "cosine":
+        expected = 1 - (vectors @ query) / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    elif metric == "euclidean":
+        expected = np.linalg.norm(vectors - query, axis=1)
+    else:
+        unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        expected = np.linalg.norm(unit - query / np.linalg.norm(query), axis=1)
+    best = np.argsort(expected)[:3]
+
+    results = index.search(query, k=3)
+    assert [label for label, _ in results] == [labels[i] for i in best]
+    np.testing.assert_allclose([d for _, d in results], expected[best], rtol=1e-4, atol=1e-5)
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean", "euclidean_l2"])
+def test_ivf_finds_each_vector_itself(metric):
+    labels, vectors = gallery(200)
+    # Probing every list makes the IVF search exhaustive
+    index = IVFIndex(metric, n_lists=8, n_probe=8).build(labels, vectors)
+    for label, vector in zip(labels, vectors):
+        assert index.search(vector, k=1)[0][0] == label
+
+
+def test_empty_index_returns_nothing():
+    index = BruteForceIndex().build([], np.empty((0, 4), dtype=np.float32))
+    assert index.search(np.ones(4), k=1) == []
+
+
+def test_build_index_picks_kind():
+    labels, vectors = gallery(10)
+    assert type(build_index(labels, vectors)) is BruteForceIndex
+    assert type(build_index(labels, vectors, kind="ivf")) is IVFIndex
+    with pytest.raises(ValueError):
+        build_index(labels, vectors, kind="lsh")
+    with pytest.raises(ValueError):
+        BruteForceIndex("manhattan")
+
+
+@pytest.mark.parametrize("index_class", [BruteForceIndex, IVFIndex])
+def test_update_replaces_and_adds(index_class):
+    labels, vectors = gallery(50)
+    index = index_class().build(labels, vectors)
+    replacement = -vectors[0]
+    extra = np.ones(vectors.shape[1], dtype=np.float32)
+    index.update(["person_0", "newcomer"], np.stack([replacement, extra]))
+
+    assert len(index) == 51
+    assert list(index.labels).count("person_0") == 1
+    assert index.search(replacement, k=1)[0][0] == "person_0"
+    assert index.search(extra, k=1)[0][0] == "newcomer"
+
+
+@pytest.mark.parametrize("index_class", [BruteForceIndex, IVFIndex])
+def test_remove(index_class):
+    labels, vectors = gallery(50)
+    index = index_class().build(labels, vectors)
+    index.remove(["person_3", "person_7", "unknown"])
+
+    assert len(index) == 48
+    assert "person_3" not in index.labels
+    assert index.search(vectors[3], k=1)[0][0] != "person_3"
+    assert index.search(vectors[10], k=1)[0][0] == "person_10"
+
+
+def test_ivf_lists_stay_consistent_after_edits():
+    labels, vectors = gallery(100)
+    index = IVFIndex(n_lists=5, n_probe=5).build(labels, vectors)
+    index.remove(labels[:10])
+    index.update(["late"], vectors[:1])
+
+    assert index.offsets[-1] == len(index.labels) == 91
+    assert np.all(np.diff(index.assignments) >= 0)
+
+
+def test_empty_ivf_trains_on_first_update():
+    index = IVFIndex(n_lists=2, n_probe=2).build([], np.empty((0, 4), dtype=np.float32))
+    assert index.search(np.ones(4), k=1) == []
+    labels, vectors = gallery(10, dim=4)
+    index.update(labels, vectors)
+    assert index.search(vectors[4], k=1)[0][0] == "person_4"
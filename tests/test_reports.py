@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+from attendance_store import JsonLinesAttendanceStore
+from reports import ReportEngine, parse_clock, work_start_minutes, write_report
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JsonLinesAttendanceStore(str(tmp_path / "attendance.jsonl"))
+    store.record_many([
+        ("2024-01-01", "alice", "08:55:00"),
+        ("2024-01-01", "bob", "09:20:30"),
+        ("2024-01-02", "alice", "09:16:00"),
+        ("2024-01-03", "bob", "09:00:00"),
+    ])
+    return store
+
+
+def test_parse_clock():
+    minutes = parse_clock(["09:00", "09:15:30", "23:59:59", "00:00:00"])
+    np.testing.assert_allclose(minutes, [540, 555.5, 1439 + 59 / 60, 0])
+
+
+def test_work_start_minutes_accepts_unpadded_hours():
+    assert work_start_minutes("9:00-17:00") == 540
+    assert work_start_minutes("09:30-17:00") == 570
+    assert work_start_minutes(" 8:05 - 16:00") == 485
+
+
+def test_late(store):
+    late = ReportEngine(store).late("2024-01-01", "2024-01-03", "9:00-17:00", 15)
+    assert list(late['name'].astype(str)) == ["bob", "alice"]
+    assert list(late['minutes_late']) == [5.5, 1.0]
+
+
+def test_summary_includes_roster_members_never_seen(store):
+    summary = ReportEngine(store).summary(
+        "2024-01-01", "2024-01-03", "09:00-17:00", 15, roster={"alice", "bob", "carol"}
+    ).set_index('name')
+    assert summary.loc["alice", 'days_present'] == 2
+    assert summary.loc["alice", 'late_days'] == 1
+    assert summary.loc["alice", 'days_absent'] == 1
+    assert summary.loc["bob", 'late_days'] == 1
+    assert summary.loc["carol", 'days_present'] == 0
+    assert summary.loc["carol", 'days_absent'] == 3
+    assert summary.loc["carol", 'mean_arrival'] == "-"
+
+
+def test_absences(store):
+    absences = ReportEngine(store).absences("2024-01-01", "2024-01-03", {"alice", "bob"})
+    pairs = {(day.strftime("%Y-%m-%d"), name) for day, name in absences.itertuples(index=False)}
+    assert pairs == {("2024-01-02", "bob"), ("2024-01-03", "alice")}
+
+
+def test_frame_is_reused_until_new_records_arrive(store):
+    engine = ReportEngine(store)
+    frame = engine.frame()
+    assert engine.frame() is frame
+    store.record("2024-01-04", "carol", "08:30:00")
+    assert len(engine.frame()) == 5
+
+
+def test_frame_appends_new_check_ins(store):
+    engine = ReportEngine(store)
+    engine.frame()
+    store.record("2024-01-03", "carol", "08:30:00")
+    store.record("2024-01-04", "alice", "09:01:00")
+    store.record("2024-01-04", "alice", "12:00:00")
+    appended = engine.frame()
+
+    rebuilt = ReportEngine(store).frame()
+    pd.testing.assert_frame_equal(
+        appended.assign(name=appended['name'].astype(object)),
+        rebuilt.assign(name=rebuilt['name'].astype(object))
+    )
+    assert len(appended) == 6
+
+
+def test_frame_rebuilds_when_an_arrival_moves_earlier(store):
+    engine = ReportEngine(store)
+    engine.frame()
+    store.record("2024-01-01", "bob", "08:00:00")
+    frame = engine.frame()
+    bob = frame[(frame['name'] == "bob") & (frame['date'] == pd.Timestamp("2024-01-01"))]
+    assert list(bob['time']) == ["08:00:00"]
+    assert len(frame) == 4
+
+
+def test_write_report(store, tmp_path):
+    records = ReportEngine(store).records("2024-01-01", "2024-01-01")
+    write_report(records, str(tmp_path / "report.csv"))
+    assert (tmp_path / "report.csv").read_text().splitlines() == [
+        "date,name,time", "2024-01-01,alice,08:55:00", "2024-01-01,bob,09:20:30"
+    ]
+
+    write_report(records, str(tmp_path / "report.txt"), title="Daily Report", group_by='date')
+    assert (tmp_path / "report.txt").read_text() == (
+        "Daily Report\n\nDate: 2024-01-01\nalice: 08:55:00\nbob: 09:20:30\n"
+    )
+    with pytest.raises(ValueError):
+        write_report(records, str(tmp_path / "report.xlsx"))
@@ -0,0 +1,91 @@
+import json
+import pytest
+from settings import SETTINGS, SettingsStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SettingsStore(str(tmp_path / "settings.json"))
+
+
+def test_defaults_parse(store):
+    assert set(store.values) == {key for key, *_ in SETTINGS}
+    assert store['verification_threshold'] is None
+    assert store['preview_resolution'] == (640, 480)
+
+
+@pytest.mark.parametrize("text, value", [
+    ("09:00-17:00", "09:00-17:00"),
+    ("9:00-17:30", "09:00-17:30"),
+    (" 8:15 - 16:00 ", "08:15-16:00"),
+])
+def test_working_hours_are_normalised(store, text, value):
+    store.set('working_hours', text)
+    assert store['working_hours'] == value
+
+
+@pytest.mark.parametrize("key, text", [
+    ('working_hours', "17:00-09:00"),
+    ('working_hours', "9-5"),
+    ('preview_resolution', "1280x"),
+    ('preview_resolution', "8x8"),
+    ('verification_threshold', "close"),
+    ('verification_threshold', "3"),
+    ('verification_workers', "1.5"),
+    ('verification_workers', "0"),
+    ('model_name', "vgg"),
+    ('camera_device', " , "),
+])
+def test_invalid_values_are_rejected(store, key, text):
+    before = store[key]
+    with pytest.raises(ValueError):
+        store.set(key, text)
+    assert store[key] == before
+
+
+def test_parse_does_not_apply(store):
+    assert store.parse('batch_size', "16") == 16
+    assert store['batch_size'] == 8
+
+
+def test_threshold_auto_or_number(store):
+    store.set('verification_threshold', "0.3")
+    assert store['verification_threshold'] == 0.3
+    store.set('verification_threshold', "auto")
+    assert store['verification_threshold'] is None
+
+
+def test_set_saves_and_notifies(store):
+    changes = []
+    store.subscribe(changes.append)
+    store.set('batch_size', "16")
+    store.set('batch_size', "16")
+    assert changes == [['batch_size']]
+    with open(store.path) as f:
+        assert json.load(f)['batch_size'] == "16"
+
+
+def test_hand_edits_are_reloaded(store):
+    store.save()
+    changes = []
+    store.subscribe(changes.append)
+    with open(store.path) as f:
+        saved = json.load(f)
+    saved.update(frame_skip="5", late_threshold="not a number", unknown="1")
+    with open(store.path, 'w') as f:
+        json.dump(saved, f)
+
+    assert store.reload_if_changed() == ['frame_skip']
+    assert store['frame_skip'] == 5
+    assert store['late_threshold'] == 15
+    assert 'late_threshold' in store.errors
+    assert changes == [['frame_skip']]
+    assert store.reload_if_changed() == []
+
+
+def test_half_written_file_keeps_current_values(store):
+    with open(store.path, 'w') as f:
+        f.write('{"frame_skip": ')
+    assert store.load() == []
+    assert 'file' in store.errors
+    assert store['frame_skip'] == 3
@@ -0,0 +1,40 @@
+import pytest
+from tracking import IoUTracker, iou
+
+
+def test_iou():
+    assert iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert iou((0, 0, 10, 10), (20, 20, 10, 10)) == 0.0
+    assert iou((0, 0, 10, 10), (5, 0, 10, 10)) == pytest.approx(50 / 150)
+
+
+def test_tracks_follow_moving_boxes():
+    tracker = IoUTracker()
+    first = tracker.update([(0, 0, 100, 100), (300, 0, 100, 100)])
+    ids = {track.box: track.id for track in first}
+
+    tracks = tracker.update([(305, 5, 100, 100), (10, 0, 100, 100)])
+    assert {track.box: track.id for track in tracks} == {
+        (10, 0, 100, 100): ids[(0, 0, 100, 100)],
+        (305, 5, 100, 100): ids[(300, 0, 100, 100)],
+    }
+
+
+def test_new_face_gets_a_new_track():
+    tracker = IoUTracker()
+    tracker.update([(0, 0, 100, 100)])
+    tracks = tracker.update([(0, 0, 100, 100), (400, 400, 80, 80)])
+    assert len({track.id for track in tracks}) == 2
+
+
+def test_lost_tracks_expire_after_max_missed():
+    tracker = IoUTracker(max_missed=2)
+    track = tracker.update([(0, 0, 100, 100)])[0]
+    track.identity = "alice"
+    for missed in (1, 2):
+        assert tracker.update([])[0].missed == missed
+    # A face coming back within the window keeps its identity
+    assert tracker.update([(5, 5, 100, 100)])[0].identity == "alice"
+    for _ in range(3):
+        tracks = tracker.update([])
+    assert tracks == []
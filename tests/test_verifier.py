@@ -0,0 +1,99 @@
+from concurrent.futures import Future
+import numpy as np
+import verifier
+from matcher import BruteForceIndex
+from verifier import ProbeCache, VerificationService, match_probe
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_match_probe_keeps_each_persons_best_template():
+    index = BruteForceIndex().build(
+        ["alice", "alice", "bob"], np.stack([unit(1, 0), unit(1, 1), unit(0, 1)])
+    )
+    matches = match_probe(index, unit(1, 0.1), threshold=0.5, top_k=5)
+    assert [name for name, _ in matches] == ["alice"]
+    assert matches[0][1] < 0.01
+
+
+def test_probe_cache_hit_within_tolerance():
+    cache = ProbeCache(tolerance=0.05)
+    cache.put(unit(1, 0), 0.4, 5, [("alice", 0.1)], cache.generation)
+    assert cache.get(unit(1, 0.05), 0.4, 5) == [("alice", 0.1)]
+    assert cache.get(unit(1, 1), 0.4, 5) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_probe_cache_keys_on_threshold_and_top_k():
+    cache = ProbeCache()
+    cache.put(unit(1, 0), 0.4, 5, [("alice", 0.1)], cache.generation)
+    assert cache.get(unit(1, 0), 0.3, 5) is None
+    assert cache.get(unit(1, 0), 0.4, 1) is None
+
+
+def test_probe_cache_expires_entries():
+    cache = ProbeCache(ttl=0.0)
+    cache.put(unit(1, 0), 0.4, 5, [("alice", 0.1)], cache.generation)
+    assert cache.get(unit(1, 0), 0.4, 5) is None
+
+
+def test_probe_cache_drops_results_from_an_old_gallery():
+    cache = ProbeCache()
+    generation = cache.generation
+    cache.clear()
+    cache.put(unit(1, 0), 0.4, 5, [("alice", 0.1)], generation)
+    assert cache.get(unit(1, 0), 0.4, 5) is None
+
+
+def test_probe_cache_evicts_least_recently_used():
+    cache = ProbeCache(max_entries=2)
+    for i, vector in enumerate((unit(1, 0), unit(0, 1), unit(-1, 0))):
+        cache.put(vector, 0.4, 5, [(f"person_{i}", 0.0)], cache.generation)
+    assert cache.get(unit(1, 0), 0.4, 5) is None
+    assert cache.get(unit(-1, 0), 0.4, 5) == [("person_2", 0.0)]
+
+
+class FixedProbeGallery:
+    # Every frame embeds to the same probe, as a person retrying in front of the camera would
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+
+    def load(self):
+        pass
+
+    def templates(self, strategy="mean", max_templates=None):
+        return ["alice", "bob"], np.stack([unit(1, 0), unit(0, 1)])
+
+    def represent(self, frame):
+        return unit(1, 0.05)
+
+
+def test_process_worker_uses_its_own_probe_cache(tmp_path, monkeypatch):
+    (tmp_path / "gallery.npz").write_bytes(b"")
+    monkeypatch.setattr(verifier, "_worker", {
+        'gallery': FixedProbeGallery(str(tmp_path / "gallery.npz")),
+        'templates': ("mean", None),
+        'cache_mtime': None,
+        'probe_cache': ProbeCache(),
+    })
+    first = verifier._verify_in_process(None, 0.4, 5, None, False)
+    second = verifier._verify_in_process(None, 0.4, 5, None, False)
+    assert first[0] == second[0] and first[0][0][0] == "alice"
+    assert first[1:] == (0, 1)
+    assert second[1:] == (1, 0)
+
+
+def test_process_results_feed_the_parent_cache_counts():
+    service = VerificationService(None, None, cache=ProbeCache())
+    try:
+        worker_future = Future()
+        future = service._unpack_worker_result(worker_future)
+        worker_future.set_running_or_notify_cancel()
+        worker_future.set_result(([("alice", 0.1)], 1, 0))
+        assert future.result(timeout=1) == [("alice", 0.1)]
+        assert (service.cache.hits, service.cache.misses) == (1, 0)
+    finally:
+        service.shutdown()
@@ -0,0 +1,176 @@
+import itertools
+import queue
+import threading
+import time
+import cv2
+from metrics import span
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+class FaceDetector:
+    # Haar cascade on a downscaled grey frame: cheap enough to run on the live stream
+    def __init__(self, scale=0.5, min_size=40):
+        self.scale = scale
+        self.min_size = min_size
+        self.cascade = cv2.CascadeClassifier(
+            cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        )
+
+    def detect(self, frame):
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        min_side = int(self.min_size * self.scale)
+        boxes = self.cascade.detectMultiScale(
+            gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_side, min_side)
+        )
+        return [tuple(int(v / self.scale) for v in box) for box in boxes]
+
+
+class Track:
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.missed = 0
+        self.identity = None
+        self.distance = None
+        self.last_embedded = None
+        self.job = None
+
+
+class IoUTracker:
+    def __init__(self, min_iou=0.3, max_missed=10):
+        self.min_iou = min_iou
+        self.max_missed = max_missed
+        self.tracks = {}
+        self._ids = itertools.count(1)
+
+    def update(self, boxes):
+        unmatched = list(boxes)
+        # Greedy matching, best overlap first
+        pairs = sorted(
+            ((iou(track.box, box), track_id, i)
+             for track_id, track in self.tracks.items()
+             for i, box in enumerate(boxes)),
+            reverse=True
+        )
+        used_tracks, used_boxes = set(), set()
+        for score, track_id, i in pairs:
+            if score < self.min_iou:
+                break
+            if track_id in used_tracks or i in used_boxes:
+                continue
+            self.tracks[track_id].box = boxes[i]
+            self.tracks[track_id].missed = 0
+            used_tracks.add(track_id)
+            used_boxes.add(i)
+
+        for track_id in list(self.tracks):
+            if track_id not in used_tracks:
+                self.tracks[track_id].missed += 1
+                if self.tracks[track_id].missed > self.max_missed:
+                    del self.tracks[track_id]
+
+        for i, box in enumerate(unmatched):
+            if i not in used_boxes:
+                track_id = next(self._ids)
+                self.tracks[track_id] = Track(track_id, box)
+        return list(self.tracks.values())
+
+
+def crop_face(frame, box, margin=0.25):
+    x, y, w, h = box
+    mx, my = int(w * margin), int(h * margin)
+    fh, fw = frame.shape[:2]
+    x0, y0 = max(0, x - mx), max(0, y - my)
+    x1, y1 = min(fw, x + w + mx), min(fh, y + h + my)
+    return frame[y0:y1, x0:x1].copy()
+
+
+class HandsFreeRecognizer(threading.Thread):
+    # Recognizers on different cameras share events, last_recorded and record_lock so a
+    # person walking past two entrances is only checked in once per cooldown
+    def __init__(self, capture, submit, cooldown=300.0, recheck_interval=2.0, detect_every=3,
+                 events=None, last_recorded=None, record_lock=None):
+        super().__init__(daemon=True)
+        self.capture = capture
+        self.submit = submit
+        self.cooldown = cooldown
+        self.recheck_interval = recheck_interval
+        self.detect_every = detect_every
+        self.detector = FaceDetector()
+        self.tracker = IoUTracker()
+        self.events = events if events is not None else queue.Queue()
+        self.last_recorded = last_recorded if last_recorded is not None else {}
+        self.record_lock = record_lock or threading.Lock()
+        self.embeddings_requested = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        last_index = None
+        processed = 0
+        while not self._stop_event.is_set():
+            index, frame = self.capture.read_latest()
+            if frame is None or index == last_index:
+                time.sleep(0.01)
+                continue
+            last_index = index
+
+            if processed % self.detect_every == 0:
+                with span("tracking_detection"):
+                    boxes = self.detector.detect(frame)
+                tracks = self.tracker.update(boxes)
+                self._schedule(tracks, frame)
+                self.capture.overlay_boxes = [
+                    (track.box, track.identity) for track in tracks if not track.missed
+                ]
+            processed += 1
+            self._collect()
+
+    def _schedule(self, tracks, frame):
+        now = time.monotonic()
+        for track in tracks:
+            if track.missed or track.job is not None or track.identity is not None:
+                continue
+            # Embed once for a new track, then retry unknown faces at the configured cadence
+            if track.last_embedded is not None and now - track.last_embedded < self.recheck_interval:
+                continue
+            track.last_embedded = now
+            track.job = self.submit(crop_face(frame, track.box))
+            self.embeddings_requested += 1
+
+    def _collect(self):
+        now = time.monotonic()
+        for track in list(self.tracker.tracks.values()):
+            job = track.job
+            if job is None or not (job.future.done() or job.timed_out()):
+                continue
+            track.job = None
+            if job.timed_out() or job.future.cancelled() or job.future.exception():
+                job.cancel()
+                continue
+            self.capture.latency.add(job.latency())
+            matches = job.future.result()
+            if not matches:
+                continue
+            track.identity, track.distance = matches[0]
+            with self.record_lock:
+                last = self.last_recorded.get(track.identity)
+                if last is None or now - last >= self.cooldown:
+                    self.last_recorded[track.identity] = now
+                    self.events.put(track.identity)
+
+    def stop(self):
+        self._stop_event.set()
+        for track in self.tracker.tracks.values():
+            if track.job is not None:
+                track.job.cancel()
+        self.capture.overlay_boxes = []
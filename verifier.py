@@ -0,0 +1,341 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+from gallery import EmbeddingGallery
+from matcher import build_index
+from metrics import METRICS, span
+
+
+def match_probe(index, probe, threshold, top_k=5, max_templates=None):
+    # Index labels are identity names; with several templates per person keep
+    # each person's best distance (best-of-k)
+    search_k = top_k * (max_templates or 10)
+    best = {}
+    for name, distance in index.search(probe, k=search_k):
+        if distance <= threshold and distance < best.get(name, float('inf')):
+            best[name] = distance
+    return sorted(best.items(), key=lambda item: item[1])[:top_k]
+
+
+def build_template_index(gallery, strategy="mean", max_templates=None):
+    labels, vectors = gallery.templates(strategy=strategy, max_templates=max_templates)
+    return build_index(labels, vectors, metric="cosine")
+
+
+class ProbeCache:
+    # Recent probe embeddings -> match results. A retry by the same person lands
+    # within `tolerance` (cosine distance) of their last probe and skips the search
+    def __init__(self, max_entries=64, ttl=10.0, tolerance=0.05):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.tolerance = tolerance
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._keys = itertools.count()
+        self._lock = threading.Lock()
+
+    def get(self, probe, threshold, top_k):
+        probe = probe / max(np.linalg.norm(probe), 1e-12)
+        now = time.monotonic()
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry[1] <= now]:
+                del self._entries[key]
+            best_key, best_distance = None, self.tolerance
+            for key, (vector, _, params, _) in self._entries.items():
+                if params != (threshold, top_k):
+                    continue
+                distance = 1.0 - float(vector @ probe)
+                if distance <= best_distance:
+                    best_key, best_distance = key, distance
+            if best_key is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_key)
+            return list(self._entries[best_key][3])
+
+    def put(self, probe, threshold, top_k, matches, generation):
+        probe = probe / max(np.linalg.norm(probe), 1e-12)
+        with self._lock:
+            # Drop results computed against a gallery that has changed since
+            if generation != self.generation:
+                return
+            self._entries[next(self._keys)] = (
+                probe, time.monotonic() + self.ttl, (threshold, top_k), list(matches)
+            )
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def count(self, hits, misses):
+        # Lookups made by a process worker's own cache, so the totals cover every mode
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+
+def verify_frame(gallery, index, frame, threshold, top_k=5, max_templates=None,
+                 gate=None, use_guide=True, embed=None, cache=None):
+    # The BGR frame goes straight to detection and embedding; nothing touches the disk.
+    # A threshold of None means the recognition model's default
+    if threshold is None:
+        threshold = gallery.default_threshold(index.metric)
+    if gate is None:
+        with span("represent"):
+            probe = gallery.represent(frame)
+    else:
+        # Detect and align once, and only spend an embedding on frames that pass the gate
+        face, _ = gate.check(frame, use_guide)
+        # Includes any wait for a batch to fill
+        with span("embedding"):
+            probe = (embed or gallery.represent_face)(face)
+    if cache is None:
+        with span("matching"):
+            return match_probe(index, probe, threshold, top_k, max_templates)
+
+    generation = cache.generation
+    matches = cache.get(probe, threshold, top_k)
+    if matches is None:
+        with span("matching"):
+            matches = match_probe(index, probe, threshold, top_k, max_templates)
+        cache.put(probe, threshold, top_k, matches, generation)
+    return matches
+
+
+class EmbeddingBatcher(threading.Thread):
+    # Collects face crops from every caller and embeds up to max_batch of them in
+    # one forward pass, holding the first crop at most max_wait seconds for company
+    def __init__(self, embed_batch, max_batch=8, max_wait=0.02):
+        super().__init__(daemon=True)
+        self.embed_batch = embed_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.faces = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+
+    def embed(self, face):
+        future = Future()
+        self._queue.put((face, future))
+        if self._stop_event.is_set():
+            self._fail_pending()
+        return future.result()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run_batch(batch)
+        self._fail_pending()
+
+    def _run_batch(self, batch):
+        batch = [(face, future) for face, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        start = time.perf_counter()
+        try:
+            embeddings = self.embed_batch([face for face, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - start
+        METRICS.record("embedding_batch", elapsed)
+        self.busy_seconds += elapsed
+        self.faces += len(batch)
+        self.batches += 1
+        for (_, future), embedding in zip(batch, embeddings):
+            future.set_result(embedding)
+
+    def _fail_pending(self):
+        while True:
+            try:
+                _, future = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError("Embedding batcher stopped"))
+
+    def throughput(self):
+        # (faces per second of model time, mean batch size)
+        if not self.batches:
+            return 0.0, 0.0
+        return self.faces / max(self.busy_seconds, 1e-9), self.faces / self.batches
+
+    def stop(self):
+        self._stop_event.set()
+
+
+# State of a process-pool worker: its own gallery copy, reloaded when the cache file
+# changes, and its own probe cache, since the parent's cannot be shared across processes
+_worker = {}
+
+
+def _init_process_worker(db_path, model_name, detector_backend, strategy, max_templates,
+                         cache_config=None):
+    _worker['gallery'] = EmbeddingGallery(db_path, model_name, detector_backend)
+    _worker['templates'] = (strategy, max_templates)
+    _worker['cache_mtime'] = None
+    _worker['probe_cache'] = ProbeCache(*cache_config) if cache_config else None
+
+
+def _verify_in_process(frame, threshold, top_k, gate, use_guide):
+    # Returns (matches, probe cache hits, probe cache misses) for this call
+    gallery = _worker['gallery']
+    cache = _worker['probe_cache']
+    try:
+        cache_mtime = os.path.getmtime(gallery.cache_path)
+    except OSError:
+        cache_mtime = None
+    if cache_mtime != _worker['cache_mtime']:
+        gallery.load()
+        _worker['index'] = build_template_index(gallery, *_worker['templates'])
+        _worker['cache_mtime'] = cache_mtime
+        if cache is not None:
+            cache.clear()
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    matches = verify_frame(
+        gallery, _worker['index'], frame, threshold, top_k, _worker['templates'][1],
+        gate, use_guide, cache=cache
+    )
+    if cache is not None:
+        hits, misses = cache.hits - hits, cache.misses - misses
+    return matches, hits, misses
+
+
+class VerificationJob:
+    def __init__(self, future, timeout):
+        self.future = future
+        self.submitted_at = time.monotonic()
+        self.deadline = self.submitted_at + timeout
+        self.cancelled = False
+        self.finished_at = None
+        # Set by the caller to the camera the frame came from
+        self.source = None
+        future.add_done_callback(self._finish)
+
+    def _finish(self, future):
+        self.finished_at = time.monotonic()
+        if not future.cancelled():
+            METRICS.record("verification", self.finished_at - self.submitted_at)
+
+    def latency(self):
+        # The done callback can trail future.done() by a moment; fall back to now
+        return (self.finished_at or time.monotonic()) - self.submitted_at
+
+    def cancel(self):
+        # A job already running cannot be interrupted; its result is simply ignored
+        self.cancelled = True
+        self.future.cancel()
+
+    def timed_out(self):
+        return not self.future.done() and time.monotonic() > self.deadline
+
+
+class VerificationService:
+    def __init__(self, gallery, get_index, mode="thread", max_workers=2, timeout=30.0,
+                 strategy="mean", max_templates=None, gate=None, max_batch=1, max_wait=0.02,
+                 cache=None):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown verification mode: {mode}")
+        self.gallery = gallery
+        self.get_index = get_index
+        self.mode = mode
+        self.timeout = timeout
+        self.max_templates = max_templates
+        self.gate = gate
+        self.cache = cache
+        self.batcher = None
+        if mode == "process":
+            # Each worker keeps a probe cache like this one and reports its hits and misses
+            cache_config = None
+            if cache is not None:
+                cache_config = (cache.max_entries, cache.ttl, cache.tolerance)
+            # Spawned, not forked: the parent already has TensorFlow and live threads,
+            # and a forked copy of that state can deadlock
+            self.executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=(
+                    gallery.db_path, gallery.model_name, gallery.detector_backend,
+                    strategy, max_templates, cache_config
+                )
+            )
+        else:
+            # Process workers each hold their own model, so only threads can share a batch
+            if max_batch > 1:
+                self.batcher = EmbeddingBatcher(gallery.represent_faces, max_batch, max_wait)
+                self.batcher.start()
+                # Keep enough frames in flight to fill a batch
+                max_workers = max(max_workers, max_batch)
+            self.executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="verify"
+            )
+
+    def submit(self, frame, threshold, top_k=5, use_guide=True):
+        if self.mode == "process":
+            future = self._unpack_worker_result(self.executor.submit(
+                _verify_in_process, frame, threshold, top_k, self.gate, use_guide
+            ))
+        else:
+            future = self.executor.submit(
+                verify_frame, self.gallery, self.get_index(), frame, threshold, top_k,
+                self.max_templates, self.gate, use_guide,
+                self.batcher.embed if self.batcher else None, self.cache
+            )
+        return VerificationJob(future, self.timeout)
+
+    def _unpack_worker_result(self, worker_future):
+        # The job sees only the matches; the worker's cache counts go to self.cache
+        future = Future()
+
+        def done(worker_future):
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                matches, hits, misses = worker_future.result()
+            except Exception as e:
+                future.set_exception(e)
+                return
+            if self.cache is not None:
+                self.cache.count(hits, misses)
+            future.set_result(matches)
+
+        def cancelled(future):
+            if future.cancelled():
+                worker_future.cancel()
+
+        future.add_done_callback(cancelled)
+        worker_future.add_done_callback(done)
+        return future
+
+    def shutdown(self):
+        if self.batcher is not None:
+            self.batcher.stop()
+        self.executor.shutdown(wait=False, cancel_futures=True)